@@ -1,9 +1,13 @@
 import streamlit as st
 import os
-from video_processor import VideoProcessor
-from config.settings import TRANSCRIPT_PATH, SUMMARY_PATH
-import json
-from collections import OrderedDict
+from video_processor import VideoProcessor, run_analysis
+from src.metadata import load_cached_metadata
+from src.catalog import count_summaries, list_summaries, get_summary_entry, find_summary_entry
+from src.search import search, TRANSCRIPT
+from src.jobs import get_job_manager, SUCCEEDED, FINISHED_STATUSES
+from src.metrics import start_metrics_server
+from src import artifacts
+from config.settings import MAX_VIDEO_DURATION_SECONDS, SIDEBAR_PAGE_SIZE, METRICS_PORT
 import markdown
 from streamlit_extras.stylable_container import stylable_container
 
@@ -19,30 +23,21 @@ st.set_page_config(layout="wide")
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
 GROQ_API_KEY = os.environ.get("GROQ_API_KEY")
 
-def read_file_content(file_path):
-    try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            return file.read()
-    except Exception as e:
-        return f"讀取檔案時發生錯誤: {str(e)}"
+# 設定 METRICS_PORT 時以 HTTP 提供 Prometheus 格式的計量資料；每個程序只會啟動一次
+if METRICS_PORT:
+    start_metrics_server(METRICS_PORT)
 
-def save_video_info(video_name, youtube_url, summary_method, summary_language, model):
-    if 'processed_videos' not in st.session_state:
-        st.session_state.processed_videos = OrderedDict()
-    
-    video_key = f"{video_name}_{summary_method}_{summary_language}_{model}"
-    st.session_state.processed_videos = OrderedDict([(video_key, youtube_url)] + list(st.session_state.processed_videos.items()))
-    
-    with open('processed_videos.json', 'w') as f:
-        json.dump(list(st.session_state.processed_videos.items()), f)
-
-def load_video_info():
-    if os.path.exists('processed_videos.json'):
-        with open('processed_videos.json', 'r') as f:
-            video_list = json.load(f)
-            st.session_state.processed_videos = OrderedDict(video_list)
-    else:
-        st.session_state.processed_videos = OrderedDict()
+STAGE_LABELS = {
+    'captions': "讀取字幕",
+    'download': "下載音訊",
+    'transcribe': "語音轉錄",
+    'summarize': "生成摘要",
+}
+
+def get_video_title(video_name):
+    # 檔名使用影片 ID，顯示時從本地 metadata 快取取得標題
+    metadata = load_cached_metadata(video_name)
+    return metadata['title'] if metadata else video_name
 
 def create_progress_bar():
     progress_container = st.container()
@@ -51,70 +46,90 @@ def create_progress_bar():
         status_text = st.empty()
     return progress_bar, status_text
 
-def update_progress(progress_bar, status_text, step, total_steps):
-    progress = int(step / total_steps * 100)
+def update_progress(progress_bar, status_text, fraction, stage=None):
+    progress = int(fraction * 100)
     progress_bar.progress(progress)
-    status_text.text(f"總體進度: {progress}%")
+    label = STAGE_LABELS.get(stage)
+    status_text.text(f"總體進度: {progress}%" + (f"（{label}）" if label else ""))
 
 def analyze_video(youtube_url, summary_method, video_language, summary_language, model, user_api_key=None, force_summarize=False):
+    # 送出背景分析工作並回傳 job_id；相同影片與參數的工作會共用同一次執行
     try:
         processor = VideoProcessor(youtube_url)
         
         duration = processor.get_video_duration()
-        if duration > 3600:
-            st.warning("由於影片時長超過60分鐘，目前不支援。請選擇較短的影片。")
+        if duration > MAX_VIDEO_DURATION_SECONDS:
+            st.warning(f"由於影片時長超過{MAX_VIDEO_DURATION_SECONDS // 60}分鐘，目前不支援。請選擇較短的影片。")
             return None
 
-        with stylable_container(
-            key="progress_container",
-            css_styles="""
-                {
-                    background-color: #2b2b2b;
-                    padding: 20px;
-                    border-radius: 10px;
-                    box-shadow: 0 4px 6px rgba(0, 0, 0, 0.3);
-                    overflow: hidden;
-                }
-            """
-        ):
-            st.markdown("### 分析進度")
-            progress_bar, status_text = create_progress_bar()
-            total_steps = 4  # 總步驟數
-            
-            # 下載並轉換影片
-            update_progress(progress_bar, status_text, 1, total_steps)
-            processor.download_and_convert(force=False)
-            
-            # 轉錄影片
-            update_progress(progress_bar, status_text, 2, total_steps)
-            transcribe_language = 'zh' if video_language.startswith('zh') else video_language
-            processor.transcribe(service='groq', force=False, language=transcribe_language)
-            
-            # 保存轉錄文本
-            update_progress(progress_bar, status_text, 3, total_steps)
-            processor.save_transcript()
-            
-            # 生成摘要
-            update_progress(progress_bar, status_text, 4, total_steps)
-            if model == "gpt-4o" and user_api_key:
-                processor.summarize(summary_method=summary_method, force=force_summarize, language=summary_language, model=model, api_key=user_api_key)
-            else:
-                processor.summarize(summary_method=summary_method, force=force_summarize, language=summary_language, model=model)
-            processor.save_summary(summary_method, language=summary_language, model=model)
-        
-        st.success("影片分析成功完成！")
-        save_video_info(processor.video_name, youtube_url, summary_method, summary_language, model)
-        return processor.video_name
+        transcribe_language = 'zh' if video_language.startswith('zh') else video_language
+        api_key = user_api_key if model == "gpt-4o" and user_api_key else None
+        # API key 不寫入工作狀態，也不影響工作是否合併
+        params = {
+            'summary_method': summary_method,
+            'transcribe_language': transcribe_language,
+            'summary_language': summary_language,
+            'model': model,
+            'force_summarize': force_summarize,
+        }
+        return get_job_manager().submit(
+            processor.video_id, "analyze", params, run_analysis,
+            url=youtube_url, api_key=api_key, **params
+        )
     except Exception as e:
         st.error(f"分析過程中發生錯誤: {str(e)}")
         return None
 
+@st.fragment(run_every=1)
+def display_job_progress():
+    active_job = st.session_state.get('active_job')
+    if not active_job:
+        return
+    job = get_job_manager().get(active_job['job_id'])
+    if job is None:
+        st.session_state.active_job = None
+        st.warning("找不到分析工作，請重新送出。")
+        return
+
+    with stylable_container(
+        key="progress_container",
+        css_styles="""
+            {
+                background-color: #2b2b2b;
+                padding: 20px;
+                border-radius: 10px;
+                box-shadow: 0 4px 6px rgba(0, 0, 0, 0.3);
+                overflow: hidden;
+            }
+        """
+    ):
+        st.markdown("### 分析進度")
+        progress_bar, status_text = create_progress_bar()
+        progress = job['progress']
+        update_progress(progress_bar, status_text, progress.get('progress', 0.0), progress.get('stage'))
+        if progress.get('partial'):
+            # 摘要生成中，逐字顯示目前的內容
+            st.markdown("### 影片摘要")
+            st.markdown(progress['partial'])
+
+    if job['status'] == SUCCEEDED:
+        st.success("影片分析成功完成！")
+        # 目錄紀錄由背景工作寫入，這裡只需切換到該筆摘要
+        st.session_state.active_job = None
+        st.session_state.current_page = "View Summary"
+        st.session_state.selected_video = get_summary_entry(job['result']['entry_id'])
+        st.rerun()
+    elif job['status'] in FINISHED_STATUSES:
+        st.session_state.active_job = None
+        st.error(f"分析過程中發生錯誤: {job['error'] or '分析工作已中斷'}")
+
 def display_video_content(video_name, summary_method, language, model):
-    summary_path = os.path.join(SUMMARY_PATH, f"{video_name}_{summary_method}_{language}_{model}.txt")
-    transcript_path = os.path.join(TRANSCRIPT_PATH, f"{video_name}.txt")
-    
     st.subheader("影片摘要")
-    summary_content = read_file_content(summary_path)
+    summary_content = artifacts.get_text(
+        artifacts.SUMMARY, video_name, {'method': summary_method, 'language': language, 'model': model}
+    )
+    if summary_content is None:
+        summary_content = "找不到摘要檔案，請重新分析此影片。"
     html_content = markdown.markdown(summary_content)
     st.markdown(f"""
     <div style="background-color: #2e2e2e; color: #ffffff; padding: 20px; border-radius: 10px; margin-bottom: 20px;">
@@ -122,7 +137,7 @@ def display_video_content(video_name, summary_method, language, model):
     </div>
     """, unsafe_allow_html=True)
     
-    transcript_content = read_file_content(transcript_path)
+    transcript_content = artifacts.load_latest_transcript(video_name) or "找不到文字稿，請重新分析此影片。"
     with st.expander("查看完整文字稿"):
         st.text_area("", transcript_content, height=300)
 
@@ -207,34 +222,45 @@ def display_new_analysis_page():
         
         st.session_state.force_summarize = False
 
+        if st.session_state.get('active_job'):
+            display_job_progress()
+
 def analyze_and_display(youtube_url, summary_method, video_language, summary_language, model, user_api_key):
     if youtube_url:
         if model == "gpt-4o" and not user_api_key:
             st.warning("請輸入您的 OpenAI API Key 以使用 GPT-4o 模型。")
             return
         
-        video_name = analyze_video(youtube_url, summary_method, video_language, summary_language, model, user_api_key, force_summarize=st.session_state.force_summarize)
-        if video_name:
-            st.success(f"已完成影片分析: {video_name}")
-            save_video_info(video_name, youtube_url, summary_method, summary_language, model)
-            st.session_state.current_page = "View Summary"
-            st.session_state.selected_video = f"{video_name}_{summary_method}_{summary_language}_{model}"
-            st.rerun()
+        job_id = analyze_video(youtube_url, summary_method, video_language, summary_language, model, user_api_key, force_summarize=st.session_state.force_summarize)
+        if job_id:
+            st.session_state.active_job = {
+                'job_id': job_id,
+                'youtube_url': youtube_url,
+                'summary_method': summary_method,
+                'summary_language': summary_language,
+                'model': model,
+            }
     else:
         st.warning("請輸入有效的 YouTube 網址。")
 
 def get_summary_method_name(method):
     return "詳細摘要"
 
-def set_selected_video(video_key):
+def set_selected_video(entry):
     st.session_state.current_page = "View Summary"
-    st.session_state.selected_video = video_key
+    st.session_state.selected_video = entry
+
+def set_sidebar_page(page):
+    st.session_state.sidebar_page = page
 
 def display_summary_page():
     if 'selected_video' in st.session_state and st.session_state.selected_video:
-        video_name, summary_method, summary_language, model = st.session_state.selected_video.rsplit('_', 3)
+        entry = st.session_state.selected_video
+        video_name, summary_method, summary_language, model = (
+            entry['video_id'], entry['summary_method'], entry['summary_language'], entry['model']
+        )
         
-        st.title(f"{video_name}")
+        st.title(entry['title'] or get_video_title(video_name))
         st.subheader(f"摘要方法: {get_summary_method_name(summary_method)}")
         st.subheader(f"摘要語言: {get_language_name(summary_language)}")
         st.subheader(f"使用模型: {model}")
@@ -244,11 +270,8 @@ def display_summary_page():
         st.warning("請先選擇一個視頻進行分析。")
 
 def get_available_languages(video_name, summary_method):
-    available_languages = []
-    for language in ["zh-tw", "zh-cn", "en", "ja", "ko", "fr", "de", "es"]:
-        if os.path.exists(os.path.join(SUMMARY_PATH, f"{video_name}_{summary_method}_{language}.txt")):
-            available_languages.append(language)
-    return available_languages
+    stored_languages = {entry['params']['language'] for entry in artifacts.find(artifacts.SUMMARY, video_name, method=summary_method)}
+    return [language for language in ["zh-tw", "zh-cn", "en", "ja", "ko", "fr", "de", "es"] if language in stored_languages]
 
 def get_language_name(language_code):
     language_names = {
@@ -263,6 +286,67 @@ def get_language_name(language_code):
     }
     return language_names.get(language_code, language_code)
 
+def display_sidebar_catalog():
+    # 只查詢目前頁面的紀錄，影片數量增加時側邊欄的成本不變
+    button_colors = {
+        "detailed": "#9C27B0"
+    }
+
+    total = count_summaries()
+    page_count = max(1, (total + SIDEBAR_PAGE_SIZE - 1) // SIDEBAR_PAGE_SIZE)
+    page = min(st.session_state.get('sidebar_page', 0), page_count - 1)
+
+    for entry in list_summaries(limit=SIDEBAR_PAGE_SIZE, offset=page * SIDEBAR_PAGE_SIZE):
+        summary_method, summary_language, model = entry['summary_method'], entry['summary_language'], entry['model']
+        button_color = button_colors.get(summary_method, "#808080")
+        video_title = entry['title'] or get_video_title(entry['video_id'])
+        
+        st.sidebar.button(
+            f"📺 {video_title} ({get_summary_method_name(summary_method)} - {get_language_name(summary_language)} - {model})",
+            key=f"summary_{entry['id']}",
+            use_container_width=True,
+            type="secondary",
+            help=f"查看 {video_title} 的 {get_summary_method_name(summary_method)} ({get_language_name(summary_language)})",
+            on_click=set_selected_video,
+            args=(entry,)
+        )
+        
+        st.sidebar.markdown(
+            f'<div class="sidebar-color-line" style="width:100%;height:3px;background-color:{button_color};"></div>',
+            unsafe_allow_html=True
+        )
+
+    if page_count > 1:
+        prev_col, next_col = st.sidebar.columns(2)
+        prev_col.button("上一頁", key="sidebar_prev", use_container_width=True, disabled=page == 0,
+                        on_click=set_sidebar_page, args=(page - 1,))
+        next_col.button("下一頁", key="sidebar_next", use_container_width=True, disabled=page >= page_count - 1,
+                        on_click=set_sidebar_page, args=(page + 1,))
+        st.sidebar.caption(f"第 {page + 1} / {page_count} 頁（共 {total} 筆）")
+
+def display_search_results(query):
+    results = search(query, limit=SIDEBAR_PAGE_SIZE)
+    if not results:
+        st.sidebar.caption("找不到符合的內容")
+        return
+
+    for index, result in enumerate(results):
+        # 文字稿的搜尋結果開啟該影片最近的摘要
+        entry = find_summary_entry(
+            result['video_id'], result['summary_method'], result['summary_language'], result['model']
+        )
+        video_title = result['title'] or get_video_title(result['video_id'])
+        source = "文字稿" if result['kind'] == TRANSCRIPT else f"{get_summary_method_name(result['summary_method'])} - {get_language_name(result['summary_language'])}"
+        st.sidebar.button(
+            f"🔍 {video_title} ({source})",
+            key=f"search_{index}_{result['video_id']}_{result['kind']}_{result['summary_language']}_{result['model']}",
+            use_container_width=True,
+            disabled=entry is None,
+            on_click=set_selected_video,
+            args=(entry,)
+        )
+        st.sidebar.markdown(result['snippet'])
+
 def main():
     st.markdown("""
         <style>
@@ -337,9 +421,6 @@ def main():
         </style>
     """, unsafe_allow_html=True)
     
-    if 'processed_videos' not in st.session_state:
-        load_video_info()
-    
     # 初始化 current_page
     if 'current_page' not in st.session_state:
         st.session_state.current_page = "New Analysis"
@@ -350,32 +431,14 @@ def main():
         st.session_state.current_page = "New Analysis"
         st.rerun()
     
+    query = st.sidebar.text_input("搜尋摘要與文字稿", key="search_query", placeholder="輸入關鍵字")
+    if query.strip():
+        display_search_results(query)
+
     st.sidebar.markdown("---")
     st.sidebar.subheader("已分析的影片")
     
-    button_colors = {
-        "detailed": "#9C27B0"
-    }
-    
-    for video_key, youtube_url in st.session_state.processed_videos.items():
-        video_name, summary_method, summary_language, model = video_key.rsplit('_', 3)
-        button_color = button_colors.get(summary_method, "#808080")
-        
-        if st.sidebar.button(
-            f"📺 {video_name} ({get_summary_method_name(summary_method)} - {get_language_name(summary_language)} - {model})",
-            key=video_key,
-            use_container_width=True,
-            type="secondary",
-            help=f"查看 {video_name} 的 {get_summary_method_name(summary_method)} ({get_language_name(summary_language)})",
-            on_click=set_selected_video,
-            args=(video_key,)
-        ):
-            pass
-        
-        st.sidebar.markdown(
-            f'<div class="sidebar-color-line" style="width:100%;height:3px;background-color:{button_color};"></div>',
-            unsafe_allow_html=True
-        )
+    display_sidebar_catalog()
 
     if st.session_state.current_page == "New Analysis":
         display_new_analysis_page()
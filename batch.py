@@ -0,0 +1,202 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from video_processor import VideoProcessor
+from src.catalog import record_summary
+from src import metrics
+from src.metadata import extract_video_id, canonical_url, is_single_video_url, list_playlist_videos
+from config.settings import (
+    BATCH_PATH, BATCH_DOWNLOAD_WORKERS, BATCH_ASR_WORKERS, BATCH_LLM_WORKERS, MAX_VIDEO_DURATION_SECONDS,
+    USE_CAPTIONS, TRANSCRIBE_SERVICE
+)
+
+logger = logging.getLogger(__name__)
+
+DOWNLOAD = "download"
+ASR = "asr"
+LLM = "llm"
+CAPTIONS = "captions"
+
+# 字幕只是網路請求，與下載共用同一組名額
+STAGE_LIMITS = {CAPTIONS: DOWNLOAD}
+# 批次的階段名稱對應到 src/metrics.py 的計量階段
+METRIC_STAGES = {DOWNLOAD: metrics.DOWNLOAD, ASR: metrics.TRANSCRIBE, LLM: metrics.SUMMARIZE, CAPTIONS: metrics.CAPTIONS}
+# 階段完成事件附帶的計量欄位
+STAGE_COUNTERS = ('cpu_seconds', 'child_cpu_seconds') + metrics.COUNTERS
+
+def read_url_file(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.strip().startswith('#')]
+
+def expand_source(source):
+    # 來源可以是單一影片、播放清單、頻道網址，或每行一個網址的文字檔
+    if os.path.isfile(source):
+        videos = []
+        for line in read_url_file(source):
+            videos.extend(expand_source(line))
+        return videos
+    if is_single_video_url(source):
+        video_id = extract_video_id(source)
+        return [{'video_id': video_id, 'url': canonical_url(video_id), 'title': None, 'duration': None}]
+    return list_playlist_videos(source)
+
+class BatchRunner:
+    def __init__(self, summary_method="detailed", transcribe_language='zh', summary_language='zh-tw', model="gpt-4o-mini",
+                 service=TRANSCRIBE_SERVICE, download_workers=BATCH_DOWNLOAD_WORKERS, asr_workers=BATCH_ASR_WORKERS,
+                 llm_workers=BATCH_LLM_WORKERS, output=None, force_summarize=False):
+        self.summary_method = summary_method
+        self.transcribe_language = transcribe_language
+        self.summary_language = summary_language
+        self.model = model
+        self.service = service
+        self.force_summarize = force_summarize
+        self.output = output or sys.stdout
+        # 每個階段各自限制同時處理的影片數；不同影片可以同時處於不同階段
+        self._stages = {
+            DOWNLOAD: threading.BoundedSemaphore(download_workers),
+            ASR: threading.BoundedSemaphore(asr_workers),
+            LLM: threading.BoundedSemaphore(llm_workers),
+        }
+        self._max_workers = download_workers + asr_workers + llm_workers
+        self._output_lock = threading.Lock()
+
+    def _emit(self, event, **fields):
+        record = {'time': round(time.time(), 3), 'event': event, **fields}
+        with self._output_lock:
+            self.output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.output.flush()
+
+    def _run_stage(self, video_id, stage, func, job_metrics):
+        with self._stages[STAGE_LIMITS.get(stage, stage)]:
+            self._emit('stage', video_id=video_id, stage=stage, status='started')
+            start = time.time()
+            try:
+                with job_metrics.stage(METRIC_STAGES[stage]):
+                    result = func()
+            except Exception as e:
+                self._emit('stage', video_id=video_id, stage=stage, status='failed',
+                           elapsed_seconds=round(time.time() - start, 3), error=str(e))
+                raise
+            counters = job_metrics.snapshot()['stages'][METRIC_STAGES[stage]]
+            self._emit('stage', video_id=video_id, stage=stage, status='done',
+                       elapsed_seconds=round(time.time() - start, 3),
+                       **{counter: round(counters[counter], 6) for counter in STAGE_COUNTERS if counters[counter]})
+            return result
+
+    def _download(self, processor):
+        duration = processor.get_video_duration()
+        if duration > MAX_VIDEO_DURATION_SECONDS:
+            raise ValueError(f"Video duration {duration}s exceeds the {MAX_VIDEO_DURATION_SECONDS}s limit")
+        processor.download_and_convert(force=False)
+
+    def _transcribe(self, processor):
+        processor.transcribe(service=self.service, language=self.transcribe_language, force=False, use_captions=False)
+        processor.save_transcript()
+
+    def _summarize(self, processor):
+        processor.summarize(summary_method=self.summary_method, force=self.force_summarize,
+                            language=self.summary_language, model=self.model)
+        processor.save_summary(self.summary_method, self.summary_language, self.model)
+
+    def process(self, video):
+        video_id = video['video_id']
+        start = time.time()
+        processor = VideoProcessor(video['url'])
+        job_metrics = metrics.JobMetrics(video_id=video_id)
+        try:
+            # 已有的摘要與文字稿直接沿用，重新執行批次時只會處理尚未完成的影片
+            if not self.force_summarize and processor.has_summary(self.summary_method, self.summary_language, self.model):
+                self._emit('result', video_id=video_id, url=video['url'], status='cached',
+                           elapsed_seconds=round(time.time() - start, 3))
+                return 'cached'
+            if processor.load_transcript(self.transcribe_language):
+                job_metrics.skip(metrics.TRANSCRIBE)
+                self._emit('stage', video_id=video_id, stage=ASR, status='cached')
+            elif USE_CAPTIONS and self._run_stage(video_id, CAPTIONS, lambda: processor.load_captions(self.transcribe_language), job_metrics):
+                processor.save_transcript()
+            else:
+                self._run_stage(video_id, DOWNLOAD, lambda: self._download(processor), job_metrics)
+                self._run_stage(video_id, ASR, lambda: self._transcribe(processor), job_metrics)
+            self._run_stage(video_id, LLM, lambda: self._summarize(processor), job_metrics)
+            record_summary(
+                video_id, self.summary_method, self.summary_language, self.model,
+                youtube_url=video['url'], title=processor.video_title
+            )
+        except Exception as e:
+            logger.error(f"Batch processing failed for {video_id}: {str(e)}")
+            job_metrics.finish("failed")
+            self._emit('result', video_id=video_id, url=video['url'], status='failed',
+                       elapsed_seconds=round(time.time() - start, 3), error=str(e))
+            return 'failed'
+        totals = job_metrics.finish("succeeded")['totals']
+        self._emit('result', video_id=video_id, url=video['url'], status='succeeded',
+                   elapsed_seconds=round(time.time() - start, 3),
+                   cost_usd=round(totals['cost_usd'], 6),
+                   summary_path=processor.summary_path(self.summary_method, self.summary_language, self.model))
+        return 'succeeded'
+
+    def run(self, sources, limit=None):
+        videos, seen = [], set()
+        for source in sources:
+            try:
+                expanded = expand_source(source)
+            except Exception as e:
+                logger.error(f"Failed to expand {source}: {str(e)}")
+                self._emit('expand', source=source, status='failed', error=str(e))
+                continue
+            self._emit('expand', source=source, status='done', videos=len(expanded))
+            for video in expanded:
+                if video['video_id'] not in seen:
+                    seen.add(video['video_id'])
+                    videos.append(video)
+        if limit:
+            videos = videos[:limit]
+
+        start = time.time()
+        counts = {'succeeded': 0, 'cached': 0, 'failed': 0}
+        with ThreadPoolExecutor(max_workers=max(1, min(self._max_workers, len(videos))), thread_name_prefix="batch") as executor:
+            for status in executor.map(self.process, videos):
+                counts[status] += 1
+        self._emit('summary', videos=len(videos), elapsed_seconds=round(time.time() - start, 3), **counts)
+        return counts
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Transcribe and summarize YouTube playlists, channels or URL lists without the web UI.")
+    parser.add_argument('sources', nargs='+', help="video, playlist or channel URLs, or text files with one URL per line")
+    parser.add_argument('--summary-method', default="detailed")
+    parser.add_argument('--transcribe-language', default='zh')
+    parser.add_argument('--summary-language', default='zh-tw')
+    parser.add_argument('--model', default="gpt-4o-mini")
+    parser.add_argument('--service', default=TRANSCRIBE_SERVICE, choices=['auto', 'groq', 'openai', 'local'])
+    parser.add_argument('--download-workers', type=int, default=BATCH_DOWNLOAD_WORKERS)
+    parser.add_argument('--asr-workers', type=int, default=BATCH_ASR_WORKERS)
+    parser.add_argument('--llm-workers', type=int, default=BATCH_LLM_WORKERS)
+    parser.add_argument('--limit', type=int, default=None, help="process at most this many videos")
+    parser.add_argument('--force-summarize', action='store_true')
+    parser.add_argument('--output', default=None, help="JSONL file for progress and results (default: data/batch/batch-<time>.jsonl)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    output_path = args.output or os.path.join(BATCH_PATH, f"batch-{time.strftime('%Y%m%d-%H%M%S')}.jsonl")
+    if os.path.dirname(output_path):
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    logger.info(f"Writing batch progress to {output_path}")
+
+    with open(output_path, 'a', encoding='utf-8') as output:
+        runner = BatchRunner(
+            summary_method=args.summary_method, transcribe_language=args.transcribe_language,
+            summary_language=args.summary_language, model=args.model, service=args.service,
+            download_workers=args.download_workers, asr_workers=args.asr_workers,
+            llm_workers=args.llm_workers, output=output, force_summarize=args.force_summarize
+        )
+        counts = runner.run(args.sources, limit=args.limit)
+    logger.info(f"Batch finished: {counts}")
+    return 1 if counts['failed'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,74 @@
+import os
+import sys
+
+# 以錄製好的字幕檔（benchmarks/fixtures/captions/）離線驗證字幕快速路徑：
+# 軌道選擇、vtt/json3 解析、自動字幕捲動重複的去除，以及品質門檻。
+# 用法：python benchmarks/check_captions.py
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, 'benchmarks', 'fixtures', 'captions')
+sys.path.insert(0, ROOT)
+
+from src.captions import fetch_captions, parse_vtt, caption_quality_ok
+
+MANUAL_TRANSCRIPT = (
+    "大家好，歡迎收看本集節目。今天要介紹影片摘要工具的快取設計。下載的音訊、逐段文字稿與摘要都會存進同一個儲存區。"
+    "重新分析同一支影片時，就不需要再呼叫付費的 API。空間超過上限時，最久沒用到的音訊會最先被清掉。\n"
+    "以上就是今天的內容，謝謝收看&訂閱。"
+)
+AUTO_TRANSCRIPT = (
+    "so today we're going to talk about caching in the download pipeline "
+    "and why it matters for long videos questions & answers are below"
+)
+
+def read_fixture(url):
+    with open(os.path.join(FIXTURES, url), 'rb') as f:
+        return f.read()
+
+def info(duration, subtitles=None, automatic_captions=None):
+    return {'id': "fixture", 'duration': duration, 'subtitles': subtitles or {}, 'automatic_captions': automatic_captions or {}}
+
+def main():
+    failures = []
+
+    def check(name, actual, expected):
+        if actual != expected:
+            failures.append(f"{name}: expected {expected!r}, got {actual!r}")
+
+    # 人工字幕優先於自動字幕，json3 優先於 vtt
+    manual = info(
+        40,
+        subtitles={'zh-TW': [{'ext': 'vtt', 'url': "missing.vtt"}, {'ext': 'json3', 'url': "manual.zh-TW.json3"}]},
+        automatic_captions={'zh-TW': [{'ext': 'vtt', 'url': "auto.en.vtt"}]},
+    )
+    check("manual track", fetch_captions(manual, 'zh-TW', fetch=read_fixture), MANUAL_TRANSCRIPT)
+    check("language prefix", fetch_captions(manual, 'zh', fetch=read_fixture), MANUAL_TRANSCRIPT)
+
+    # 自動字幕逐行捲動的重複文字只保留一次；機器翻譯的軌道（網址含 tlang）不採用
+    auto = info(
+        20,
+        automatic_captions={
+            'en': [{'ext': 'vtt', 'url': "auto.en.vtt"}],
+            'ja': [{'ext': 'vtt', 'url': "auto.en.vtt&tlang=ja"}],
+        },
+    )
+    transcript = fetch_captions(auto, 'en', fetch=read_fixture)
+    check("auto track", transcript, AUTO_TRANSCRIPT)
+    check("overlap collapsed", (transcript or "").count("caching in the download pipeline"), 1)
+    check("translated auto track", fetch_captions(auto, 'ja', fetch=read_fixture), None)
+    check("auto captions disabled", fetch_captions(auto, 'en', allow_auto=False, fetch=read_fixture), None)
+
+    # 只有片尾一句話的字幕涵蓋範圍夠，但文字量太少，品質門檻應拒絕並改用語音轉錄
+    sparse = info(300, automatic_captions={'en': [{'ext': 'vtt', 'url': "sparse.en.vtt"}]})
+    check("sparse quality gate", caption_quality_ok(parse_vtt(read_fixture("sparse.en.vtt").decode('utf-8')), 300), False)
+    check("sparse track", fetch_captions(sparse, 'en', fetch=read_fixture), None)
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if failures:
+        return 1
+    print("OK")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
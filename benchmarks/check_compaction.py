@@ -0,0 +1,46 @@
+import os
+import sys
+
+# 文字稿壓縮（src/compaction.py）的範例：每個輸入應得到完全相同的輸出。
+# 用法：python benchmarks/check_compaction.py
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.compaction import compact_transcript
+
+EXAMPLES = [
+    # chunk 邊界的重疊
+    ("part one ends here today\nends here today and part two", "part one ends here today\nand part two"),
+    # Whisper 連續重複的句子
+    ("Hello world. Hello world. Hello world.", "Hello world."),
+    ("第一句。第二句。第一句。第二句。第三句。", "第一句。第二句。第三句。"),
+    # 字幕署名幻覺
+    ("開始了。\n字幕由Amara.org社區提供", "開始了。"),
+    # 一句話內的重複片段；數字不視為重複
+    ("Value is 1000000 and 我們我們我們我們開始", "Value is 1000000 and 我們開始"),
+    # 語助詞
+    ("Um, so we start. Uh we go.", "so we start. we go."),
+    ("我們嗯，開始吧", "我們開始吧"),
+    ("えーと、始めます", "始めます"),
+    # 連字號詞中的 uh / hmm 不是語助詞
+    ("Take the uh-oh moment.", "Take the uh-oh moment."),
+    ("hmm-hmm yes", "hmm-hmm yes"),
+    ("The drum-um sound.", "The drum-um sound."),
+]
+
+def main():
+    failures = []
+    for text, expected in EXAMPLES:
+        actual, _ = compact_transcript(text)
+        if actual != expected:
+            failures.append(f"{text!r}: expected {expected!r}, got {actual!r}")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if failures:
+        return 1
+    print("OK")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
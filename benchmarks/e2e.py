@@ -0,0 +1,256 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import threading
+import subprocess
+import urllib.request
+
+# 端對端 benchmark：合成音訊 → （替身 yt-dlp）下載 → 切割與轉錄 → 摘要，全部離線執行。
+# 每個長度在獨立的 worker 行程與暫存資料夾中執行，回報各階段的 wall/CPU 時間、峰值 RSS 與傳輸量。
+# 用法：
+#   python benchmarks/e2e.py --minutes 10 60 180 --save-baseline benchmarks/baseline.json
+#   python benchmarks/e2e.py --minutes 10 60 180 --baseline benchmarks/baseline.json --tolerance 0.2
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.join(ROOT, 'benchmarks')
+FIXTURE_DIR = os.path.join(BENCH_DIR, '.fixtures')
+sys.path[:0] = [ROOT, BENCH_DIR]
+
+DEFAULT_MINUTES = [10, 60, 180]
+STAGES = ['download', 'transcribe', 'summarize']
+RESULT_MARKER = "BENCH_RESULT "
+# 低於此秒數的差異視為雜訊，不列為退步
+NOISE_FLOOR_SECONDS = 0.05
+
+def synthetic_audio(minutes, bitrate='128k'):
+    # 5.5 秒的音調接 1.5 秒靜音，讓依停頓切割的邏輯也會被執行到；產生過的檔案會重複使用
+    path = os.path.join(FIXTURE_DIR, f"speech-{minutes}min-{bitrate}.m4a")
+    if os.path.exists(path):
+        return path
+    from src.media import ffmpeg_binary
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    tmp_path = path + ".tmp.m4a"
+    subprocess.run([
+        ffmpeg_binary(), '-y', '-v', 'error',
+        '-f', 'lavfi', '-i', f"sine=frequency=220:sample_rate=44100:duration={minutes * 60}",
+        '-af', "volume='if(lt(mod(t,7),5.5),0.6,0)':eval=frame",
+        '-ac', '2', '-c:a', 'aac', '-b:a', bitrate, tmp_path
+    ], check=True)
+    os.replace(tmp_path, path)
+    return path
+
+class RssSampler:
+    # 以背景執行緒定期讀取 RSS，記錄各階段的峰值
+    def __init__(self, interval=0.02):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def _current(self):
+        try:
+            with open('/proc/self/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+        # 沒有 /proc 時退回整個行程的峰值（macOS 的單位是 bytes）
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self._current())
+            time.sleep(self.interval)
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True).start()
+        return self
+
+    def reset(self):
+        self.peak = self._current()
+
+    def stop(self):
+        self._stop.set()
+
+def _provider_stats(provider_url, reset=True):
+    with urllib.request.urlopen(f"{provider_url}/__stats{'?reset=1' if reset else ''}") as response:
+        return json.loads(response.read())
+
+def run_worker(minutes, service, fake_whisper=False):
+    # 在 worker 行程內執行：以替身取代 yt_dlp（與 faster_whisper）後才 import 專案模組
+    import fake_ytdlp
+    sys.modules['yt_dlp'] = fake_ytdlp
+    if fake_whisper:
+        import fake_whisper as fake_whisper_module
+        sys.modules['faster_whisper'] = fake_whisper_module
+    from video_processor import VideoProcessor
+
+    provider_url = os.environ['BENCH_PROVIDER_URL']
+    sampler = RssSampler().start()
+    processor = VideoProcessor(f"https://www.youtube.com/watch?v=bench{minutes:06d}")
+    stages = {}
+
+    def measure(name, func):
+        _provider_stats(provider_url)
+        sampler.reset()
+        children_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        func()
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        children_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+        provider = _provider_stats(provider_url)
+        stages[name] = {
+            'wall_seconds': round(wall, 3),
+            'cpu_seconds': round(cpu, 3),
+            'child_cpu_seconds': round(
+                (children_after.ru_utime + children_after.ru_stime) - (children_before.ru_utime + children_before.ru_stime), 3
+            ),
+            'peak_rss_mb': round(sampler.peak / (1024 * 1024), 1),
+            'requests': sum(endpoint['requests'] for endpoint in provider.values()),
+            'provider_errors': sum(endpoint['errors'] + endpoint['rate_limited'] for endpoint in provider.values()),
+            'bytes_sent': sum(endpoint['bytes_in'] for endpoint in provider.values()),
+            'bytes_received': sum(endpoint['bytes_out'] for endpoint in provider.values()),
+        }
+
+    measure('download', lambda: processor.download_and_convert(force=False))
+    stages['download']['bytes_received'] = os.path.getsize(processor.audio_path)
+    measure('transcribe', lambda: processor.transcribe(service=service, language='zh', use_captions=False))
+    measure('summarize', lambda: processor.summarize(summary_method="detailed", language='zh-tw', model="gpt-4o-mini"))
+    sampler.stop()
+
+    children_maxrss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    result = {
+        'minutes': minutes,
+        'stages': stages,
+        'total_wall_seconds': round(sum(stage['wall_seconds'] for stage in stages.values()), 3),
+        'peak_rss_mb': max(stage['peak_rss_mb'] for stage in stages.values()),
+        'children_peak_rss_mb': round(children_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1),
+        'transcript_chars': len(processor.transcript),
+    }
+    print(RESULT_MARKER + json.dumps(result))
+
+def run_one(minutes, args, provider_url):
+    fixture = synthetic_audio(minutes, args.bitrate)
+    workdir = tempfile.mkdtemp(prefix=f"bench-{minutes}min-")
+    # 專案以相對路徑讀取 src/prompts 並寫入 data/，每次都在乾淨的資料夾執行以避免快取影響結果
+    os.symlink(os.path.join(ROOT, 'src'), os.path.join(workdir, 'src'))
+    env = dict(os.environ)
+    env.update({
+        'PYTHONPATH': os.pathsep.join([ROOT, BENCH_DIR, env.get('PYTHONPATH', '')]),
+        'GROQ_API_KEY': 'bench', 'OPENAI_API_KEY': 'bench',
+        'GROQ_BASE_URL': provider_url, 'OPENAI_BASE_URL': f"{provider_url}/v1",
+        'BENCH_PROVIDER_URL': provider_url,
+        'BENCH_AUDIO_FIXTURE': fixture,
+        'BENCH_AUDIO_SECONDS': str(minutes * 60),
+        'USE_CAPTIONS': 'false',
+    })
+    try:
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--worker', str(minutes), '--service', args.service]
+            + (['--fake-whisper'] if args.fake_whisper else []),
+            cwd=workdir, env=env, capture_output=True, text=True
+        )
+        if completed.returncode != 0:
+            raise RuntimeError(f"Benchmark worker for {minutes} minutes failed:\n{completed.stderr[-4000:]}")
+        for line in completed.stdout.splitlines():
+            if line.startswith(RESULT_MARKER):
+                return json.loads(line[len(RESULT_MARKER):])
+        raise RuntimeError(f"Benchmark worker for {minutes} minutes produced no result")
+    finally:
+        if not args.keep_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+def print_results(results):
+    print(f"{'minutes':>7} {'stage':<11} {'wall s':>8} {'cpu s':>8} {'child s':>8} {'peak MB':>8} {'reqs':>6} {'sent MB':>8} {'recv MB':>8}")
+    for minutes, result in results.items():
+        for stage in STAGES:
+            data = result['stages'][stage]
+            print(f"{minutes:>7} {stage:<11} {data['wall_seconds']:>8.2f} {data['cpu_seconds']:>8.2f} {data['child_cpu_seconds']:>8.2f} "
+                  f"{data['peak_rss_mb']:>8.1f} {data['requests']:>6} {data['bytes_sent'] / 1e6:>8.2f} {data['bytes_received'] / 1e6:>8.2f}")
+        print(f"{minutes:>7} {'total':<11} {result['total_wall_seconds']:>8.2f}  (children peak RSS {result['children_peak_rss_mb']} MB)")
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for minutes, result in results.items():
+        base = baseline.get('results', {}).get(minutes)
+        if not base:
+            print(f"{minutes} minutes: no baseline")
+            continue
+        for stage in STAGES:
+            new, old = result['stages'][stage], base['stages'].get(stage)
+            if not old:
+                continue
+            for metric in ('wall_seconds', 'peak_rss_mb'):
+                change = (new[metric] - old[metric]) / old[metric] if old[metric] else 0.0
+                print(f"{minutes:>7} {stage:<11} {metric:<13} {old[metric]:>9.2f} -> {new[metric]:>9.2f} ({change:+.1%})")
+                noise = NOISE_FLOOR_SECONDS if metric == 'wall_seconds' else 0
+                if change > tolerance and new[metric] - old[metric] > noise:
+                    regressions.append(f"{minutes}min {stage} {metric} {change:+.1%}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark with synthetic audio and local provider stand-ins.")
+    parser.add_argument('--minutes', type=int, nargs='+', default=DEFAULT_MINUTES)
+    parser.add_argument('--service', default='groq', choices=['auto', 'groq', 'openai', 'local'])
+    parser.add_argument('--fake-whisper', action='store_true', help="Use a stand-in for faster-whisper with --service local.")
+    parser.add_argument('--bitrate', default='128k', help="Bitrate of the synthetic source audio.")
+    parser.add_argument('--latency', type=float, default=0.05, help="Seconds added to every provider request.")
+    parser.add_argument('--latency-per-mb', type=float, default=0.1, help="Seconds added per MB uploaded to the provider.")
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit', type=float, default=0.0, help="Provider requests per second before HTTP 429.")
+    parser.add_argument('--slow-rate', type=float, default=0.0, help="Fraction of provider requests delayed by --slow-seconds.")
+    parser.add_argument('--slow-seconds', type=float, default=0.0)
+    parser.add_argument('--output', help="Write results as JSON to this file.")
+    parser.add_argument('--save-baseline', help="Write results as a baseline JSON file.")
+    parser.add_argument('--baseline', help="Compare against a saved baseline and fail on regressions.")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed relative regression before failing.")
+    parser.add_argument('--keep-workdir', action='store_true')
+    parser.add_argument('--worker', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        run_worker(args.worker, args.service, args.fake_whisper)
+        return 0
+
+    from fake_providers import FakeProviderServer, ProviderConfig
+    config = ProviderConfig(args.latency, args.latency_per_mb, args.error_rate, args.rate_limit,
+                            slow_rate=args.slow_rate, slow_seconds=args.slow_seconds)
+    server = FakeProviderServer(config).start()
+    try:
+        results = {}
+        for minutes in args.minutes:
+            print(f"Running {minutes}-minute benchmark...", file=sys.stderr)
+            results[str(minutes)] = run_one(minutes, args, server.url)
+    finally:
+        server.stop()
+
+    print_results(results)
+    report = {
+        'config': {key: getattr(args, key) for key in ('service', 'fake_whisper', 'bitrate', 'latency', 'latency_per_mb', 'error_rate', 'rate_limit', 'slow_rate', 'slow_seconds')},
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': results,
+    }
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w') as f:
+                json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("FAIL: " + "; ".join(regressions), file=sys.stderr)
+            return 1
+        print("OK")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
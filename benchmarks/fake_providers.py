@@ -0,0 +1,206 @@
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# 模擬 Groq / OpenAI 的轉錄與 chat completion API，可設定延遲、錯誤率與速率限制，供離線 benchmark 使用。
+# 以 GROQ_BASE_URL=http://127.0.0.1:<port> 與 OPENAI_BASE_URL=http://127.0.0.1:<port>/v1 指向本伺服器。
+# 用法：python benchmarks/fake_providers.py --port 8765 --latency 0.2 --error-rate 0.05 --rate-limit 10
+
+SAMPLE_SENTENCE = "今天我們來討論這個主題的背景、目前的發展以及未來可能的方向。"
+SUMMARY_TEXT = "## 摘要\n\n" + "\n".join(f"- 第 {i} 個重點：{SAMPLE_SENTENCE}" for i in range(1, 11))
+
+class ProviderConfig:
+    def __init__(self, latency=0.0, latency_per_mb=0.0, error_rate=0.0, rate_limit=0.0, chars_per_kb=1.5, seed=0,
+                 slow_rate=0.0, slow_seconds=0.0):
+        self.latency = latency
+        self.latency_per_mb = latency_per_mb
+        self.error_rate = error_rate
+        # 長尾延遲：這個比例的請求額外等待 slow_seconds 秒（模擬被節流或卡住的請求）
+        self.slow_rate = slow_rate
+        self.slow_seconds = slow_seconds
+        # 每秒可接受的請求數；0 表示不限制
+        self.rate_limit = rate_limit
+        # 每 KB 上傳音訊產生的文字稿字數（24kbps Opus 約每秒 4.5 字）
+        self.chars_per_kb = chars_per_kb
+        self.random = random.Random(seed)
+
+class FakeProviderServer:
+    def __init__(self, config=None, host="127.0.0.1", port=0):
+        self.config = config or ProviderConfig()
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._tokens = self.config.rate_limit
+        self._last_refill = time.monotonic()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.startswith("/__stats"):
+                    self._send(200, json.dumps(server.stats(reset="reset=1" in self.path)).encode(), "application/json")
+                else:
+                    self._send(404, b'{"error": "not found"}', "application/json")
+
+            def do_POST(self):
+                body = self._read_body()
+                endpoint = "transcriptions" if self.path.endswith("/audio/transcriptions") else \
+                    "chat" if self.path.endswith("/chat/completions") else None
+                if endpoint is None:
+                    self._send(404, b'{"error": "not found"}', "application/json")
+                    return
+                status, payload, content_type, headers = server.handle(endpoint, body)
+                server.record(endpoint, status, len(body), len(payload))
+                self._send(status, payload, content_type, headers)
+
+            def _read_body(self):
+                if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+                    chunks = []
+                    while True:
+                        size = int(self.rfile.readline().strip(), 16)
+                        if size == 0:
+                            self.rfile.readline()
+                            return b"".join(chunks)
+                        chunks.append(self.rfile.read(size))
+                        self.rfile.readline()
+                return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+            def _send(self, status, payload, content_type, headers=None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _take_token(self):
+        if not self.config.rate_limit:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.config.rate_limit, self._tokens + (now - self._last_refill) * self.config.rate_limit)
+            self._last_refill = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def handle(self, endpoint, body):
+        if not self._take_token():
+            retry_ms = int(1000 / self.config.rate_limit)
+            return 429, b'{"error": {"message": "rate limited", "type": "rate_limit"}}', "application/json", {
+                "retry-after-ms": str(retry_ms), "retry-after": str(max(1, retry_ms // 1000)),
+            }
+        with self._lock:
+            slow = self.config.random.random() < self.config.slow_rate
+            failed = self.config.random.random() < self.config.error_rate
+        time.sleep(self.config.latency + self.config.latency_per_mb * len(body) / (1024 * 1024) + (self.config.slow_seconds if slow else 0))
+        if failed:
+            return 500, b'{"error": {"message": "injected failure", "type": "server_error"}}', "application/json", {}
+        if endpoint == "transcriptions":
+            return self._transcription(body)
+        return self._chat(body)
+
+    def _transcription(self, body):
+        chars = max(1, int(len(body) / 1024 * self.config.chars_per_kb))
+        text = (SAMPLE_SENTENCE * (chars // len(SAMPLE_SENTENCE) + 1))[:chars]
+        # OpenAI 以 response_format=text 要求純文字回應
+        if b'name="response_format"\r\n\r\ntext' in body:
+            return 200, text.encode(), "text/plain; charset=utf-8", {}
+        return 200, json.dumps({"text": text}, ensure_ascii=False).encode(), "application/json", {}
+
+    def _chat(self, body):
+        request = json.loads(body or b"{}")
+        prompt_chars = sum(len(message.get('content') or '') for message in request.get('messages', []))
+        usage = {"prompt_tokens": prompt_chars, "completion_tokens": len(SUMMARY_TEXT), "total_tokens": prompt_chars + len(SUMMARY_TEXT)}
+        created = int(time.time())
+        if request.get('stream'):
+            events = []
+            for i in range(0, len(SUMMARY_TEXT), 20):
+                chunk = {
+                    "id": "chatcmpl-bench", "object": "chat.completion.chunk", "created": created, "model": request.get('model'),
+                    "choices": [{"index": 0, "delta": {"content": SUMMARY_TEXT[i:i + 20]}, "finish_reason": None}],
+                }
+                events.append(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n")
+            if (request.get('stream_options') or {}).get('include_usage'):
+                # 與 OpenAI 相同：最後一個 chunk 沒有 choices，只帶整個請求的 usage
+                usage_chunk = {"id": "chatcmpl-bench", "object": "chat.completion.chunk", "created": created,
+                               "model": request.get('model'), "choices": [], "usage": usage}
+                events.append(f"data: {json.dumps(usage_chunk)}\n\n")
+            events.append("data: [DONE]\n\n")
+            return 200, "".join(events).encode(), "text/event-stream", {}
+        response = {
+            "id": "chatcmpl-bench", "object": "chat.completion", "created": created, "model": request.get('model'),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": SUMMARY_TEXT}, "finish_reason": "stop"}],
+            "usage": usage,
+        }
+        return 200, json.dumps(response, ensure_ascii=False).encode(), "application/json", {}
+
+    def record(self, endpoint, status, bytes_in, bytes_out):
+        with self._lock:
+            stats = self._stats.setdefault(endpoint, {'requests': 0, 'errors': 0, 'rate_limited': 0, 'bytes_in': 0, 'bytes_out': 0})
+            stats['requests'] += 1
+            stats['errors'] += status >= 500
+            stats['rate_limited'] += status == 429
+            stats['bytes_in'] += bytes_in
+            stats['bytes_out'] += bytes_out
+
+    def stats(self, reset=False):
+        with self._lock:
+            result = json.loads(json.dumps(self._stats))
+            if reset:
+                self._stats = {}
+        return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Run local stand-ins for the Groq and OpenAI APIs.")
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to every request.")
+    parser.add_argument('--latency-per-mb', type=float, default=0.0, help="Seconds added per MB of request body.")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests answered with HTTP 500.")
+    parser.add_argument('--rate-limit', type=float, default=0.0, help="Requests per second before answering HTTP 429.")
+    parser.add_argument('--slow-rate', type=float, default=0.0, help="Fraction of requests delayed by --slow-seconds.")
+    parser.add_argument('--slow-seconds', type=float, default=0.0)
+    args = parser.parse_args()
+
+    config = ProviderConfig(args.latency, args.latency_per_mb, args.error_rate, args.rate_limit,
+                            slow_rate=args.slow_rate, slow_seconds=args.slow_seconds)
+    server = FakeProviderServer(config, args.host, args.port).start()
+    print(f"Fake providers listening on {server.url}")
+    print(f"  GROQ_BASE_URL={server.url}  OPENAI_BASE_URL={server.url}/v1")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
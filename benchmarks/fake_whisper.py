@@ -0,0 +1,39 @@
+import os
+import time
+import types
+import threading
+
+# 取代 faster_whisper 的最小替身：不載入模型，依音訊檔大小產生固定文字並模擬 CPU 推論時間，供離線 benchmark 使用。
+# benchmark worker 以 sys.modules['faster_whisper'] = fake_whisper 安裝（e2e.py --service local --fake-whisper）。
+
+SAMPLE_SENTENCE = "今天我們來討論這個主題的背景、目前的發展以及未來可能的方向。"
+# 每 KB 音訊產生的字數，與 fake_providers 相同
+CHARS_PER_KB = 1.5
+# 每 KB 音訊的模擬推論秒數
+SECONDS_PER_KB = float(os.environ.get("BENCH_WHISPER_SECONDS_PER_KB", 0.0005))
+
+loaded_models = []
+
+class WhisperModel:
+    def __init__(self, model_size_or_path, device="auto", compute_type="default", cpu_threads=0, num_workers=1,
+                 download_root=None, **kwargs):
+        self.model = model_size_or_path
+        # 與真正的模型一樣，num_workers 限制可同時推論的數量
+        self._workers = threading.Semaphore(max(1, num_workers))
+        loaded_models.append(self)
+
+    def transcribe(self, audio, language=None, **kwargs):
+        size_kb = os.path.getsize(audio) / 1024
+        with self._workers:
+            time.sleep(size_kb * SECONDS_PER_KB)
+        chars = int(size_kb * CHARS_PER_KB)
+        text = (SAMPLE_SENTENCE * (chars // len(SAMPLE_SENTENCE) + 1))[:chars]
+        segments = (types.SimpleNamespace(text=text[i:i + 60]) for i in range(0, len(text), 60))
+        return segments, types.SimpleNamespace(language=language or "zh", duration=size_kb * 8 / 24)
+
+class BatchedInferencePipeline:
+    def __init__(self, model):
+        self.model = model
+
+    def transcribe(self, audio, language=None, batch_size=8, **kwargs):
+        return self.model.transcribe(audio, language=language, **kwargs)
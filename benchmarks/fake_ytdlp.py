@@ -0,0 +1,69 @@
+import os
+import shutil
+import types
+
+# 取代 yt_dlp 的最小替身：任何影片網址都對應到 BENCH_AUDIO_FIXTURE 指定的本地音訊檔，不連網。
+# benchmark worker 以 sys.modules['yt_dlp'] = fake_ytdlp 安裝。
+
+class DownloadError(Exception):
+    pass
+
+utils = types.SimpleNamespace(DownloadError=DownloadError)
+
+def _fixture():
+    path = os.environ["BENCH_AUDIO_FIXTURE"]
+    return path, os.path.splitext(path)[1].lstrip('.')
+
+def _info(url):
+    path, ext = _fixture()
+    video_id = url.rstrip('/').split('=')[-1].split('/')[-1]
+    return {
+        'id': video_id,
+        'title': f"Benchmark {video_id}",
+        'duration': float(os.environ.get("BENCH_AUDIO_SECONDS", 0)),
+        'channel': "benchmark",
+        'format_id': "140",
+        'ext': ext,
+        'abr': 128,
+        'url': path,
+        'webpage_url': url,
+        'subtitles': {},
+        'automatic_captions': {},
+    }
+
+class YoutubeDL:
+    def __init__(self, params=None):
+        self.params = params or {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def sanitize_info(self, info):
+        return dict(info)
+
+    def extract_info(self, url, download=True):
+        info = _info(url)
+        if download:
+            self._download(info)
+        return info
+
+    def process_ie_result(self, info, download=True):
+        if download:
+            self._download(info)
+        return info
+
+    def _download(self, info):
+        path, ext = _fixture()
+        output = self.params.get('outtmpl', '%(id)s.%(ext)s') % {'ext': ext, 'id': info['id']}
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+        shutil.copyfile(path, output)
+        # 需要轉檔時（INGEST_MODE=mp3）以 ffmpeg 轉成 mp3，與 FFmpegExtractAudio 的結果相同
+        if self.params.get('postprocessors'):
+            from src.media import ffmpeg_binary
+            import subprocess
+            mp3_path = os.path.splitext(output)[0] + ".mp3"
+            subprocess.run([ffmpeg_binary(), '-y', '-v', 'error', '-i', output, '-b:a', '192k', mp3_path], check=True)
+            os.remove(output)
@@ -0,0 +1,70 @@
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+# 在全新的 Python 行程中量測 import 時間，並確認重量級套件沒有在 import 時被載入。
+# 用法：python benchmarks/import_time.py [--module video_processor] [--budget 0.3] [--runs 5]
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ['yt_dlp', 'groq', 'openai', 'httpx', 'pydub', 'numpy', 'requests', 'streamlit']
+DEFAULT_BUDGET_SECONDS = 0.3
+
+PROBE = """
+import sys, json, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'loaded': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+def measure(module, runs):
+    # 不帶 API key 與 Streamlit，確認核心模組在這種環境下也能 import
+    env = {key: value for key, value in os.environ.items() if key not in ('OPENAI_API_KEY', 'GROQ_API_KEY')}
+    samples = []
+    loaded = set()
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, '-c', PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            cwd=ROOT, env=env, capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+        data = json.loads(result.stdout.strip().splitlines()[-1])
+        samples.append(data['seconds'])
+        loaded.update(data['loaded'])
+    return samples, sorted(loaded)
+
+def main():
+    parser = argparse.ArgumentParser(description="Assert an import-time budget for a module.")
+    parser.add_argument('--module', default='video_processor')
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET_SECONDS, help="Budget for the median import time, in seconds.")
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    samples, loaded = measure(args.module, args.runs)
+    median = statistics.median(samples)
+    print(json.dumps({
+        'module': args.module,
+        'median_seconds': round(median, 4),
+        'max_seconds': round(max(samples), 4),
+        'budget_seconds': args.budget,
+        'heavy_modules_loaded': loaded,
+    }, indent=2))
+
+    failures = []
+    if median > args.budget:
+        failures.append(f"median import time {median:.3f}s exceeds budget {args.budget:.3f}s")
+    if loaded:
+        failures.append(f"heavy modules loaded at import time: {', '.join(loaded)}")
+    if failures:
+        print("FAIL: " + "; ".join(failures), file=sys.stderr)
+        return 1
+    print("OK")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
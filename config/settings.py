@@ -1,3 +1,138 @@
+import os
+
+# 下載中的音訊暫存處；完成後移入 ARTIFACT_PATH
 AUDIO_PATH = "data/audio/"
+# 舊版的文字稿與摘要資料夾，只用於第一次啟動時匯入 ARTIFACT_PATH
 SUMMARY_PATH = "data/summaries/"
 TRANSCRIPT_PATH = "data/transcripts/"
+
+# 音訊、chunk 轉錄結果、文字稿、筆記與摘要的產物 store（見 src/artifacts.py）。
+# 總大小超過 ARTIFACT_BUDGET_MB 時依最後使用時間淘汰，越難重新產生的產物保留越久；設為 0 則不限制
+ARTIFACT_PATH = "data/artifacts/"
+ARTIFACT_BUDGET_BYTES = int(os.environ.get("ARTIFACT_BUDGET_MB", 2048)) * 1024 * 1024
+# 最近這段時間內用過的產物（例如轉錄中的音訊）不會被淘汰
+ARTIFACT_MIN_IDLE_SECONDS = int(os.environ.get("ARTIFACT_MIN_IDLE_SECONDS", 3600))
+
+# 同時送出轉錄請求的 chunk 數量
+TRANSCRIBE_MAX_WORKERS = int(os.environ.get("TRANSCRIBE_MAX_WORKERS", 4))
+# 網頁介面使用的語音轉錄服務：groq、openai、auto（在已設定 API key 的服務間分配 chunk，見下方），
+# 或 local（本機 CPU 執行 faster-whisper，需另外安裝）。
+# auto 需明確啟用：摘要一定會設定 OPENAI_API_KEY，auto 會把部分 chunk 與備援請求送到價格較高的 OpenAI
+TRANSCRIBE_SERVICE = os.environ.get("TRANSCRIBE_SERVICE", "groq")
+
+# service='auto' 使用的服務，依序為沒有延遲資料時的偏好順序；同一服務可用逗號分隔設定多組 key（GROQ_API_KEYS、OPENAI_API_KEYS）
+TRANSCRIBE_PROVIDERS = [p.strip() for p in os.environ.get("TRANSCRIBE_PROVIDERS", "groq,openai").split(",") if p.strip()]
+# chunk 等待超過該服務過去延遲的這個百分位數時，另送一份到其他服務，採用先回傳的結果；0 表示不送備援請求
+TRANSCRIBE_HEDGE_PERCENTILE = float(os.environ.get("TRANSCRIBE_HEDGE_PERCENTILE", 0.95))
+# 延遲資料還不夠時，每分鐘音訊的備援等待秒數（1800 秒的 chunk 預設等 300 秒）；以及備援等待的下限
+TRANSCRIBE_HEDGE_INITIAL_SECONDS_PER_MINUTE = float(os.environ.get("TRANSCRIBE_HEDGE_INITIAL_SECONDS_PER_MINUTE", 10))
+TRANSCRIBE_HEDGE_MIN_SECONDS = float(os.environ.get("TRANSCRIBE_HEDGE_MIN_SECONDS", 2))
+
+# 本機轉錄（service='local'）的模型與資源設定；模型名稱也可以是已轉換好的 CTranslate2 模型資料夾
+LOCAL_WHISPER_MODEL = os.environ.get("LOCAL_WHISPER_MODEL", "small")
+LOCAL_WHISPER_DEVICE = os.environ.get("LOCAL_WHISPER_DEVICE", "cpu")
+LOCAL_WHISPER_COMPUTE_TYPE = os.environ.get("LOCAL_WHISPER_COMPUTE_TYPE", "int8")
+# 同時轉錄的 chunk 數；每個 worker 使用 LOCAL_WHISPER_CPU_THREADS 個核心
+LOCAL_WHISPER_WORKERS = int(os.environ.get("LOCAL_WHISPER_WORKERS", max(1, (os.cpu_count() or 1) // 4)))
+LOCAL_WHISPER_CPU_THREADS = int(os.environ.get("LOCAL_WHISPER_CPU_THREADS", max(1, (os.cpu_count() or 1) // LOCAL_WHISPER_WORKERS)))
+# 同一個 chunk 內一起推論的 30 秒視窗數；1 表示不批次處理
+LOCAL_WHISPER_BATCH_SIZE = int(os.environ.get("LOCAL_WHISPER_BATCH_SIZE", 8))
+# 本機轉錄沒有上傳大小限制，chunk 以原始格式切出（不重新編碼），長度只影響平行度
+LOCAL_WHISPER_CHUNK_SECONDS = int(os.environ.get("LOCAL_WHISPER_CHUNK_SECONDS", 600))
+LOCAL_WHISPER_BEAM_SIZE = int(os.environ.get("LOCAL_WHISPER_BEAM_SIZE", 5))
+LOCAL_WHISPER_DOWNLOAD_ROOT = "data/models/"
+
+METADATA_PATH = "data/metadata/"
+# 已分析影片的目錄（SQLite）；側邊欄每頁顯示的筆數
+CATALOG_PATH = "data/catalog.db"
+SIDEBAR_PAGE_SIZE = int(os.environ.get("SIDEBAR_PAGE_SIZE", 20))
+# 影片 metadata 快取的有效時間（秒）
+METADATA_TTL_SECONDS = int(os.environ.get("METADATA_TTL_SECONDS", 24 * 3600))
+# 記憶體中保留 metadata 的影片數（最久沒用到的先移除）；yt-dlp 完整結果只在 METADATA_INFO_MAX_AGE_SECONDS 內保留
+METADATA_MEMORY_CACHE_SIZE = int(os.environ.get("METADATA_MEMORY_CACHE_SIZE", 256))
+METADATA_INFO_MAX_AGE_SECONDS = int(os.environ.get("METADATA_INFO_MAX_AGE_SECONDS", 3600))
+
+# 超過此 token 數的文字稿會先分段摘要（map），再合併成最終摘要（reduce）
+SUMMARY_SECTION_MAX_TOKENS = int(os.environ.get("SUMMARY_SECTION_MAX_TOKENS", 12000))
+SUMMARY_MAX_WORKERS = int(os.environ.get("SUMMARY_MAX_WORKERS", 4))
+# 同一部影片的其他摘要方式/語言，改由已有的中間筆記或既有摘要（翻譯）產生，而非重送整份文字稿
+SUMMARY_FAN_OUT = os.environ.get("SUMMARY_FAN_OUT", "true").lower() == "true"
+# 舊版的中間筆記資料夾，只用於匯入 ARTIFACT_PATH
+NOTES_PATH = "data/notes/"
+# 摘要前先壓縮文字稿：移除 chunk 邊界重複、Whisper 重複產生的幻覺句子、語助詞與多餘空白（見 src/compaction.py）
+COMPACT_TRANSCRIPT = os.environ.get("COMPACT_TRANSCRIPT", "true").lower() == "true"
+# 可處理的影片最長時間（秒）
+MAX_VIDEO_DURATION_SECONDS = int(os.environ.get("MAX_VIDEO_DURATION_SECONDS", 4 * 3600))
+
+# 切割與轉錄之間的佇列長度（已切好、等待轉錄的 chunk 數上限）
+PIPELINE_QUEUE_SIZE = int(os.environ.get("PIPELINE_QUEUE_SIZE", 2))
+
+JOBS_PATH = "data/jobs/"
+# 背景分析工作同時執行的數量上限
+JOB_MAX_WORKERS = int(os.environ.get("JOB_MAX_WORKERS", 2))
+# 已結束的工作在記憶體中保留的秒數，之後改由 JOBS_PATH 中的紀錄讀取
+JOB_RETENTION_SECONDS = int(os.environ.get("JOB_RETENTION_SECONDS", 600))
+
+BATCH_PATH = "data/batch/"
+# 影片有對應語言的字幕時直接使用，不下載音訊也不送 Whisper；字幕涵蓋率或文字量不足時改用語音轉錄
+USE_CAPTIONS = os.environ.get("USE_CAPTIONS", "true").lower() == "true"
+CAPTIONS_ALLOW_AUTO = os.environ.get("CAPTIONS_ALLOW_AUTO", "true").lower() == "true"
+CAPTION_MIN_COVERAGE = float(os.environ.get("CAPTION_MIN_COVERAGE", 0.8))
+CAPTION_MIN_CHARS_PER_MINUTE = int(os.environ.get("CAPTION_MIN_CHARS_PER_MINUTE", 100))
+
+# 批次處理（batch.py）各階段同時處理的影片數上限
+BATCH_DOWNLOAD_WORKERS = int(os.environ.get("BATCH_DOWNLOAD_WORKERS", 2))
+BATCH_ASR_WORKERS = int(os.environ.get("BATCH_ASR_WORKERS", 2))
+BATCH_LLM_WORKERS = int(os.environ.get("BATCH_LLM_WORKERS", 4))
+
+# 單一 chunk 轉錄失敗時的重試次數與初始等待秒數
+TRANSCRIBE_MAX_RETRIES = int(os.environ.get("TRANSCRIBE_MAX_RETRIES", 3))
+TRANSCRIBE_RETRY_DELAY_SECONDS = float(os.environ.get("TRANSCRIBE_RETRY_DELAY_SECONDS", 2))
+
+# chunk 邊界移到最接近的停頓處；在每個邊界前 SILENCE_SEARCH_SECONDS 秒內尋找
+SPLIT_ON_SILENCE = os.environ.get("SPLIT_ON_SILENCE", "true").lower() == "true"
+SILENCE_SEARCH_SECONDS = float(os.environ.get("SILENCE_SEARCH_SECONDS", 30))
+# 上傳前移除超過 STRIP_MIN_SILENCE_SECONDS 的靜音片段；轉錄服務只回傳純文字，文字稿不含時間資訊，
+# 因此移除靜音不影響文字稿內容，但也無法從文字稿對回原始影片的時間
+STRIP_SILENCE = os.environ.get("STRIP_SILENCE", "false").lower() == "true"
+STRIP_MIN_SILENCE_SECONDS = float(os.environ.get("STRIP_MIN_SILENCE_SECONDS", 2.0))
+# 低於片段音量峰值（第 95 百分位）多少 dB 視為靜音
+SILENCE_THRESHOLD_DB = float(os.environ.get("SILENCE_THRESHOLD_DB", -35))
+
+# 送去轉錄的 chunk 編碼（見 src/audio_splitter.py 的 ENCODING_PROFILES）；設為空字串則沿用原始格式
+TRANSCRIBE_ENCODING = os.environ.get("TRANSCRIBE_ENCODING", "opus") or None
+# 單次上傳的檔案大小上限，chunk 長度由此與編碼位元率推算
+TRANSCRIBE_MAX_UPLOAD_BYTES = int(os.environ.get("TRANSCRIBE_MAX_UPLOAD_BYTES", 24 * 1024 * 1024))
+# chunk 長度上限，保留一些並行轉錄的空間
+TRANSCRIBE_MAX_CHUNK_SECONDS = int(os.environ.get("TRANSCRIBE_MAX_CHUNK_SECONDS", 1800))
+
+# "native"：下載原始音訊串流（m4a/webm）直接切割，不轉成完整 MP3；"mp3"：舊的 192kbps MP3 流程
+INGEST_MODE = os.environ.get("INGEST_MODE", "native")
+# 關閉時不在磁碟保留完整音訊，直接從 YouTube 串流網址切割 chunk
+CACHE_AUDIO = os.environ.get("CACHE_AUDIO", "true").lower() == "true"
+
+# API client 的逾時（秒）、重試次數與連線池大小
+PROVIDER_TIMEOUTS = {
+    'groq': float(os.environ.get("GROQ_TIMEOUT_SECONDS", 300)),
+    'openai': float(os.environ.get("OPENAI_TIMEOUT_SECONDS", 600)),
+}
+PROVIDER_CONNECT_TIMEOUT_SECONDS = float(os.environ.get("PROVIDER_CONNECT_TIMEOUT_SECONDS", 10))
+PROVIDER_MAX_RETRIES = int(os.environ.get("PROVIDER_MAX_RETRIES", 4))
+PROVIDER_RETRY_BASE_SECONDS = float(os.environ.get("PROVIDER_RETRY_BASE_SECONDS", 1))
+PROVIDER_RETRY_MAX_SECONDS = float(os.environ.get("PROVIDER_RETRY_MAX_SECONDS", 60))
+PROVIDER_MAX_CONNECTIONS = int(os.environ.get("PROVIDER_MAX_CONNECTIONS", 20))
+
+# 各階段的計時、傳輸量、token 與成本紀錄；每個工作寫入 METRICS_PATH/jobs/<job_id>.json，
+# 累計值寫入 METRICS_PATH/metrics.prom。METRICS_PORT 非 0 時另以 HTTP 提供 /metrics
+METRICS_PATH = "data/metrics/"
+METRICS_PORT = int(os.environ.get("METRICS_PORT", 0))
+# 估算成本用的價格（美元）：轉錄為每分鐘音訊，LLM 為每百萬 token 的 (輸入, 輸出)
+TRANSCRIPTION_PRICES_PER_MINUTE = {
+    'groq': 0.111 / 60,
+    'openai': 0.006,
+}
+LLM_PRICES_PER_MILLION_TOKENS = {
+    'gpt-4o-mini': (0.15, 0.60),
+    'gpt-4o': (2.50, 10.00),
+    'gpt-4': (30.00, 60.00),
+}
@@ -0,0 +1,255 @@
+import os
+import sys
+import json
+import time
+import uuid
+import shutil
+import sqlite3
+import hashlib
+import logging
+import threading
+from contextlib import closing
+from config.settings import (
+    ARTIFACT_PATH, ARTIFACT_BUDGET_BYTES, ARTIFACT_MIN_IDLE_SECONDS, TRANSCRIPT_PATH, SUMMARY_PATH, NOTES_PATH
+)
+
+logger = logging.getLogger(__name__)
+
+AUDIO = "audio"
+CHUNK = "chunk"
+TRANSCRIPT = "transcript"
+NOTES = "notes"
+SUMMARY = "summary"
+
+# 淘汰順序依「最後使用時間 + 保留加成」由小到大：重新產生越貴（需要付費 API 呼叫）的產物保留越久，
+# 音訊可以重新下載，因此最先被淘汰
+RETENTION_BONUS_SECONDS = {
+    AUDIO: 0,
+    CHUNK: 24 * 3600,
+    NOTES: 7 * 24 * 3600,
+    TRANSCRIPT: 90 * 24 * 3600,
+    SUMMARY: 90 * 24 * 3600,
+}
+
+MANIFEST_FILE = "manifest.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS artifacts (
+    key TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    video_id TEXT NOT NULL,
+    params TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_artifacts_video ON artifacts (video_id, kind);
+CREATE INDEX IF NOT EXISTS idx_artifacts_accessed_at ON artifacts (accessed_at);
+"""
+
+_initialized = set()
+_init_lock = threading.Lock()
+_evict_lock = threading.Lock()
+
+def connect(store_path=ARTIFACT_PATH):
+    os.makedirs(store_path, exist_ok=True)
+    manifest_path = os.path.join(store_path, MANIFEST_FILE)
+    conn = sqlite3.connect(manifest_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA busy_timeout = 30000")
+    with _init_lock:
+        if manifest_path not in _initialized:
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.executescript(SCHEMA)
+            _initialized.add(manifest_path)
+            _import_legacy_files(conn, store_path)
+    return conn
+
+def artifact_key(kind, video_id, params):
+    # 以影片 ID 與產生該產物的參數決定鍵值；參數不同（語言、模型、服務……）就是不同的產物
+    payload = json.dumps({'kind': kind, 'video_id': video_id, 'params': params}, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+def artifact_path(kind, video_id, params, ext, store_path=ARTIFACT_PATH):
+    key = artifact_key(kind, video_id, params)
+    return os.path.join(store_path, kind, key[:2], f"{key}{ext}")
+
+def _entry(row):
+    entry = dict(row)
+    entry['params'] = json.loads(entry['params'])
+    return entry
+
+def _touch(conn, key):
+    with conn:
+        conn.execute("UPDATE artifacts SET accessed_at = ? WHERE key = ?", (time.time(), key))
+
+def _forget(conn, key):
+    with conn:
+        conn.execute("DELETE FROM artifacts WHERE key = ?", (key,))
+
+def get_path(kind, video_id, params, store_path=ARTIFACT_PATH):
+    key = artifact_key(kind, video_id, params)
+    with closing(connect(store_path)) as conn:
+        row = conn.execute("SELECT path FROM artifacts WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if not os.path.exists(row['path']):
+            # 檔案被手動刪除時，同步移除 manifest 紀錄
+            _forget(conn, key)
+            return None
+        _touch(conn, key)
+        return row['path']
+
+def get_text(kind, video_id, params, store_path=ARTIFACT_PATH):
+    path = get_path(kind, video_id, params, store_path)
+    if path is None:
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+def find(kind, video_id, store_path=ARTIFACT_PATH, **filters):
+    # 同一部影片某類產物的所有版本，最近使用的在前；filters 比對參數中的欄位
+    with closing(connect(store_path)) as conn:
+        rows = conn.execute(
+            "SELECT * FROM artifacts WHERE video_id = ? AND kind = ? ORDER BY accessed_at DESC", (video_id, kind)
+        ).fetchall()
+    entries = [_entry(row) for row in rows if os.path.exists(row['path'])]
+    return [entry for entry in entries if all(entry['params'].get(name) == value for name, value in filters.items())]
+
+def load_latest_transcript(video_id, store_path=ARTIFACT_PATH):
+    # 最近使用的文字稿（不論語言與來源），供顯示與建立索引
+    for entry in find(TRANSCRIPT, video_id, store_path):
+        transcript = get_text(TRANSCRIPT, video_id, entry['params'], store_path)
+        if transcript is not None:
+            return transcript
+    return None
+
+def _tmp_path(path):
+    return f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+
+def _record(kind, video_id, params, path, store_path):
+    now = time.time()
+    with closing(connect(store_path)) as conn:
+        with conn:
+            conn.execute(
+                "INSERT INTO artifacts (key, kind, video_id, params, path, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET path = excluded.path, size = excluded.size, "
+                "created_at = excluded.created_at, accessed_at = excluded.accessed_at",
+                (artifact_key(kind, video_id, params), kind, video_id, json.dumps(params, sort_keys=True),
+                 path, os.path.getsize(path), now, now)
+            )
+    evict(store_path=store_path)
+    return path
+
+def put_text(kind, video_id, params, text, ext=".txt", store_path=ARTIFACT_PATH):
+    # 先寫入同目錄的暫存檔再 rename，讀取端不會看到寫到一半的檔案；暫存檔名唯一，同時寫入同一產物也不會互相干擾
+    path = artifact_path(kind, video_id, params, ext, store_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = _tmp_path(path)
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+    return _record(kind, video_id, params, path, store_path)
+
+def put_file(kind, video_id, params, source_path, store_path=ARTIFACT_PATH):
+    # 把已產生的檔案（例如下載的音訊）移進 store，保留原副檔名
+    path = artifact_path(kind, video_id, params, os.path.splitext(source_path)[1], store_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = _tmp_path(path)
+    shutil.move(source_path, tmp_path)
+    os.replace(tmp_path, path)
+    return _record(kind, video_id, params, path, store_path)
+
+def usage(store_path=ARTIFACT_PATH):
+    with closing(connect(store_path)) as conn:
+        rows = conn.execute("SELECT kind, COUNT(*) AS count, SUM(size) AS size FROM artifacts GROUP BY kind").fetchall()
+    return {row['kind']: {'count': row['count'], 'size': row['size']} for row in rows}
+
+def evict(budget_bytes=ARTIFACT_BUDGET_BYTES, store_path=ARTIFACT_PATH, min_idle_seconds=ARTIFACT_MIN_IDLE_SECONDS):
+    # 總大小超過預算時依保留順序刪除；最近 min_idle_seconds 內用過的產物（例如轉錄中的音訊）不會被刪除
+    if not budget_bytes:
+        return 0
+    with _evict_lock, closing(connect(store_path)) as conn:
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM artifacts").fetchone()[0]
+        if total <= budget_bytes:
+            return 0
+        bonus = " ".join(f"WHEN '{kind}' THEN {seconds}" for kind, seconds in RETENTION_BONUS_SECONDS.items())
+        candidates = conn.execute(
+            f"SELECT key, kind, video_id, params, path, size FROM artifacts WHERE accessed_at < ? "
+            f"ORDER BY accessed_at + CASE kind {bonus} ELSE 0 END",
+            (time.time() - min_idle_seconds,)
+        ).fetchall()
+        freed = 0
+        evicted = []
+        for row in candidates:
+            if total - freed <= budget_bytes:
+                break
+            try:
+                os.remove(row['path'])
+            except FileNotFoundError:
+                pass
+            _forget(conn, row['key'])
+            freed += row['size']
+            evicted.append(_entry(row))
+            logger.info(f"Evicted {row['kind']} artifact {row['key']} ({row['size']} bytes)")
+        if total - freed > budget_bytes:
+            logger.warning(f"Artifact store still uses {total - freed} bytes, over the {budget_bytes} byte budget; remaining artifacts are in use")
+    _drop_listings(evicted, store_path)
+    return freed
+
+def _drop_listings(evicted, store_path):
+    # 被淘汰的摘要與文字稿同時從側邊欄目錄與搜尋索引移除，避免列出打不開的項目。
+    # catalog / search 依賴本模組，在這裡才載入
+    from src.catalog import delete_summary
+    from src.search import remove_document
+    for entry in evicted:
+        video_id, params = entry['video_id'], entry['params']
+        if entry['kind'] == SUMMARY and {'method', 'language', 'model'} <= params.keys():
+            delete_summary(video_id, params['method'], params['language'], params['model'])
+            remove_document(video_id, SUMMARY, params['method'], params['language'], params['model'])
+        elif entry['kind'] == TRANSCRIPT and not find(TRANSCRIPT, video_id, store_path):
+            # 搜尋索引每支影片只有一份文字稿，還有其他版本時保留
+            remove_document(video_id, TRANSCRIPT)
+
+def _import_legacy_files(conn, store_path):
+    # 舊版直接寫在 data/transcripts、data/summaries、data/notes 的檔案，在 manifest 建立時一次移入 store。
+    # 舊版文字稿沒有記錄語言與來源，以 source='legacy' 標記
+    if conn.execute("SELECT 1 FROM artifacts LIMIT 1").fetchone():
+        return
+    legacy = []
+    for directory, kind in ((TRANSCRIPT_PATH, TRANSCRIPT), (SUMMARY_PATH, SUMMARY), (NOTES_PATH, NOTES)):
+        if not os.path.isdir(directory):
+            continue
+        for filename in sorted(os.listdir(directory)):
+            name, ext = os.path.splitext(filename)
+            if kind == TRANSCRIPT and ext == ".txt":
+                legacy.append((kind, name, {'source': "legacy"}, filename, directory))
+            elif kind == SUMMARY and ext == ".txt" and len(name.rsplit('_', 3)) == 4:
+                video_id, method, language, model = name.rsplit('_', 3)
+                legacy.append((kind, video_id, {'method': method, 'language': language, 'model': model}, filename, directory))
+            elif kind == NOTES and ext == ".md" and len(name.rsplit('_', 2)) == 3:
+                video_id, transcript_key, model = name.rsplit('_', 2)
+                legacy.append((kind, video_id, {'transcript': transcript_key, 'model': model}, filename, directory))
+    now = time.time()
+    with conn:
+        for kind, video_id, params, filename, directory in legacy:
+            path = artifact_path(kind, video_id, params, os.path.splitext(filename)[1], store_path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            shutil.move(os.path.join(directory, filename), path)
+            conn.execute(
+                "INSERT OR REPLACE INTO artifacts (key, kind, video_id, params, path, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (artifact_key(kind, video_id, params), kind, video_id, json.dumps(params, sort_keys=True),
+                 path, os.path.getsize(path), now, now)
+            )
+    if legacy:
+        logger.info(f"Imported {len(legacy)} legacy files into the artifact store")
+
+if __name__ == "__main__":
+    # python -m src.artifacts：各類產物的數量與大小；加上 --evict 依預算立即清理
+    if sys.argv[1:] == ["--evict"]:
+        print(f"Freed {evict()} bytes")
+    for kind, stats in sorted(usage().items()):
+        print(f"{kind:<11} {stats['count']:>6} files {stats['size'] / (1024 * 1024):>10.1f} MB")
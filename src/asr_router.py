@@ -0,0 +1,210 @@
+import os
+import time
+import queue
+import logging
+import threading
+from collections import deque
+from src import metrics
+from src.clients import PROVIDERS, get_client, is_retryable, retry_delay, parse_retry_after
+from config.settings import (
+    TRANSCRIBE_PROVIDERS, TRANSCRIBE_MAX_RETRIES, TRANSCRIBE_HEDGE_PERCENTILE,
+    TRANSCRIBE_HEDGE_INITIAL_SECONDS_PER_MINUTE, TRANSCRIBE_HEDGE_MIN_SECONDS
+)
+
+logger = logging.getLogger(__name__)
+
+# service='auto'：在所有已設定 API key 的服務（以及同一服務的多組 key）之間分配 chunk。
+# 每個 chunk 送往預期最快的 endpoint（依最近的延遲、錯誤率與進行中的請求數）；等待超過該 endpoint 延遲的
+# TRANSCRIBE_HEDGE_PERCENTILE 百分位數時，再送一份到下一個最佳 endpoint（優先選不同服務），採用先成功回傳的結果。
+# 失敗時立即換到其他 endpoint，所有 endpoint 都失敗過才退避等待。
+# 被取代的請求無法中途取消，完成後仍計入延遲統計與費用。
+
+# 每個 endpoint 保留最近的延遲樣本數；樣本少於 MIN_SAMPLES 時改用所有 endpoint 的合併樣本
+WINDOW = 50
+MIN_SAMPLES = 5
+# 錯誤率只看最近這段時間，失敗過的 endpoint 之後仍有機會被選回來
+ERROR_WINDOW_SECONDS = 300
+# 延遲以「每秒音訊需要的秒數」記錄；短 chunk 的延遲主要是固定開銷，以至少 60 秒計算
+MIN_NORMALIZED_AUDIO_SECONDS = 60
+
+class Endpoint:
+    def __init__(self, provider, api_key, index):
+        self.provider = provider
+        self.api_key = api_key
+        self.name = f"{provider}#{index + 1}" if index else provider
+        self.rates = deque(maxlen=WINDOW)
+        # (時間, 是否成功)
+        self.outcomes = deque(maxlen=WINDOW)
+        self.in_flight = 0
+        # 收到 429 後，在伺服器要求的時間內排到最後
+        self.cooldown_until = 0.0
+
+    def error_rate(self, now):
+        recent = [ok for at, ok in self.outcomes if now - at < ERROR_WINDOW_SECONDS]
+        return recent.count(False) / len(recent) if recent else 0.0
+
+# (provider, api_key) -> Endpoint；延遲與錯誤統計跨工作累積
+_endpoints = {}
+_lock = threading.Lock()
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def _normalized(audio_seconds):
+    return max(audio_seconds or 0, MIN_NORMALIZED_AUDIO_SECONDS)
+
+def _api_keys(provider):
+    key_name = PROVIDERS[provider][2]
+    keys = [key.strip() for key in os.environ.get(f"{key_name}S", "").split(",") if key.strip()]
+    return list(dict.fromkeys(keys or [os.environ.get(key_name)]))
+
+def endpoints(providers=None):
+    result = []
+    with _lock:
+        for provider in providers or TRANSCRIBE_PROVIDERS:
+            if provider not in PROVIDERS:
+                raise ValueError(f"Unsupported transcription provider: {provider}")
+            for index, api_key in enumerate(key for key in _api_keys(provider) if key):
+                endpoint = _endpoints.get((provider, api_key))
+                if endpoint is None:
+                    endpoint = _endpoints[(provider, api_key)] = Endpoint(provider, api_key, index)
+                result.append(endpoint)
+    if not result:
+        key_names = ", ".join(PROVIDERS[provider][2] for provider in providers or TRANSCRIBE_PROVIDERS if provider in PROVIDERS)
+        raise ValueError(f"No transcription provider is configured; set one of {key_names}")
+    return result
+
+def _pick(candidates, avoid=(), hedge=False):
+    # 排序：沒送過這個 chunk 的 endpoint、不同服務、不在冷卻中，再比較預期延遲 ×（進行中的請求數 + 1）÷ 成功率。
+    # 還沒有延遲資料的 endpoint 以目前最快的中位數估計，讓新 endpoint 有機會被試用；平手時依 TRANSCRIBE_PROVIDERS 順序。
+    # 備援請求只送到沒送過、也不在冷卻中的 endpoint，沒有就回傳 None，不對已經很慢或被限流的 key 加重負載
+    now = time.monotonic()
+    with _lock:
+        medians = [_percentile(endpoint.rates, 0.5) for endpoint in candidates if endpoint.rates]
+        fallback = min(medians) if medians else 1.0
+        if hedge:
+            candidates = [endpoint for endpoint in candidates if endpoint not in avoid and now >= endpoint.cooldown_until]
+            if not candidates:
+                return None
+        avoid_providers = {endpoint.provider for endpoint in avoid}
+
+        def key(endpoint):
+            rate = _percentile(endpoint.rates, 0.5) if endpoint.rates else fallback
+            expected = rate * (1 + endpoint.in_flight) / max(0.05, 1 - endpoint.error_rate(now))
+            return (endpoint in avoid, endpoint.provider in avoid_providers, now < endpoint.cooldown_until, expected)
+
+        endpoint = min(candidates, key=key)
+        endpoint.in_flight += 1
+        return endpoint
+
+def _hedge_delay(endpoint, candidates, audio_seconds):
+    with _lock:
+        rates = list(endpoint.rates)
+        if len(rates) < MIN_SAMPLES:
+            rates = [rate for candidate in candidates for rate in candidate.rates]
+    if len(rates) < MIN_SAMPLES:
+        # 沒有延遲資料時同樣依 chunk 長度計算，長 chunk 不會在剛啟動時一律送出付費的備援請求
+        rates = [TRANSCRIBE_HEDGE_INITIAL_SECONDS_PER_MINUTE / 60]
+    return max(TRANSCRIBE_HEDGE_MIN_SECONDS, _percentile(rates, TRANSCRIBE_HEDGE_PERCENTILE) * _normalized(audio_seconds))
+
+def _attempt(endpoint, call, audio_seconds, results, done):
+    started = time.monotonic()
+    metrics.record(requests=1)
+    try:
+        text = call(get_client(endpoint.provider, endpoint.api_key), endpoint.provider)
+    except Exception as e:
+        now = time.monotonic()
+        with _lock:
+            endpoint.in_flight -= 1
+            # chunk 已由其他請求完成後才失敗的（例如 chunk 檔已刪除），不算在這個 endpoint 頭上
+            if not done.is_set():
+                endpoint.outcomes.append((now, False))
+                if getattr(e, 'status_code', None) == 429:
+                    retry_after = parse_retry_after(getattr(getattr(e, 'response', None), 'headers', None))
+                    endpoint.cooldown_until = now + (retry_after if retry_after is not None else retry_delay(0, e))
+        results.put((endpoint, None, e))
+        return
+    now = time.monotonic()
+    with _lock:
+        endpoint.in_flight -= 1
+        endpoint.outcomes.append((now, True))
+        endpoint.rates.append((now - started) / _normalized(audio_seconds))
+    metrics.record(cost_usd=metrics.transcription_cost(endpoint.provider, audio_seconds))
+    results.put((endpoint, text, None))
+
+def transcribe(call, audio_seconds, label, max_retries=TRANSCRIBE_MAX_RETRIES, providers=None):
+    # call(client, provider) 轉錄一個 chunk 並回傳文字；每次嘗試在獨立執行緒執行，回傳第一個成功的結果
+    candidates = endpoints(providers)
+    results = queue.Queue()
+    done = threading.Event()
+    sent = []
+    failed = []
+    pending = 0
+
+    def launch(endpoint):
+        nonlocal pending
+        pending += 1
+        sent.append(endpoint)
+        threading.Thread(
+            target=metrics.bind(_attempt), args=(endpoint, call, audio_seconds, results, done), daemon=True
+        ).start()
+
+    def hedge_at(endpoint):
+        if TRANSCRIBE_HEDGE_PERCENTILE <= 0:
+            return None
+        return time.monotonic() + _hedge_delay(endpoint, candidates, audio_seconds)
+
+    started = time.monotonic()
+    primary = _pick(candidates)
+    launch(primary)
+    # 每個 chunk 最多一個備援請求
+    hedged = False
+    deadline = hedge_at(primary)
+    while True:
+        try:
+            endpoint, text, error = results.get(timeout=None if deadline is None else max(0.0, deadline - time.monotonic()))
+        except queue.Empty:
+            deadline = None
+            hedge = _pick(candidates, avoid=sent, hedge=True)
+            if hedge is None:
+                logger.info(f"Chunk {label} has waited {time.monotonic() - started:.1f}s on {primary.name}; no other provider available to hedge")
+                continue
+            logger.warning(
+                f"Chunk {label} has waited {time.monotonic() - started:.1f}s on {primary.name}; "
+                f"sending a hedged request to {hedge.name}"
+            )
+            metrics.record(hedges=1)
+            launch(hedge)
+            hedged = True
+            continue
+        pending -= 1
+        if error is None:
+            done.set()
+            if endpoint is not primary:
+                logger.info(f"Chunk {label}: {endpoint.name} answered first after {time.monotonic() - started:.1f}s")
+            return text
+
+        failed.append(endpoint)
+        logger.warning(f"Chunk {label}: {endpoint.name} failed ({type(error).__name__}: {str(error)})")
+        if pending:
+            # 另一個請求仍在進行，等它的結果
+            continue
+        untried = [candidate for candidate in candidates if candidate not in failed]
+        if len(failed) > max_retries or (not untried and not is_retryable(error)):
+            done.set()
+            raise error
+        if not untried:
+            # 每個 endpoint 都失敗過，退避後再試
+            delay = retry_delay(len(failed) - len(candidates), error)
+            if delay is None:
+                # 伺服器要求的等待時間超過上限，不提早重試
+                done.set()
+                raise error
+            logger.warning(f"Chunk {label}: all providers failed, retrying in {delay:.1f}s")
+            time.sleep(delay)
+        metrics.record(retries=1)
+        primary = _pick(candidates, avoid=failed if untried else ())
+        launch(primary)
+        if not hedged:
+            deadline = hedge_at(primary)
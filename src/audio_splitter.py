@@ -1,44 +1,220 @@
 import os
+import io
+import re
+import math
+import uuid
 import logging
-from pydub import AudioSegment
+import subprocess
+from functools import lru_cache
+from config.settings import SPLIT_ON_SILENCE, SILENCE_SEARCH_SECONDS, STRIP_MIN_SILENCE_SECONDS
+from src.silence import plan_silence_aware_chunks, frame_energy_db, speech_spans
+from src.media import is_remote, get_stream, ffmpeg_input_args, source_extension, chunk_prefix, ffmpeg_binary
 
 logger = logging.getLogger(__name__)
 
+# ffmpeg 的 muxer 名稱與副檔名不一定相同
+FFMPEG_FORMATS = {
+    "m4a": "ipod",
+}
+
+# 轉錄用的編碼設定；Whisper 只需要 16kHz 單聲道，低位元率即可
+ENCODING_PROFILES = {
+    "opus": {
+        "format": "ogg",
+        "codec": "libopus",
+        "sample_rate": 16000,
+        "channels": 1,
+        "bitrate": 24000,
+        "options": ['-application', 'voip', '-vbr', 'constrained'],
+    },
+    "mp3_mono": {
+        "format": "mp3",
+        "codec": "libmp3lame",
+        "sample_rate": 16000,
+        "channels": 1,
+        "bitrate": 32000,
+        "options": [],
+    },
+}
+
+# 預留容器標頭與 VBR 波動的空間
+UPLOAD_SIZE_MARGIN = 0.9
+MIN_CHUNK_SECONDS = 60
+
+def _file_key(audio_path):
+    if is_remote(audio_path):
+        return audio_path, 0, 0
+    audio_path = os.path.abspath(audio_path)
+    stat = os.stat(audio_path)
+    return audio_path, stat.st_mtime_ns, stat.st_size
+
+def _probe_with_ffmpeg(audio_path):
+    # 沒有 ffprobe 時，改從 `ffmpeg -i` 輸出的檔頭資訊讀取長度
+    result = subprocess.run([ffmpeg_binary(), '-hide_banner', *ffmpeg_input_args(audio_path)], capture_output=True)
+    header = result.stderr.decode('utf-8', errors='replace')
+    match = re.search(r'Duration: (\d+):(\d+):(\d+(?:\.\d+)?)', header)
+    if not match:
+        raise RuntimeError(f"Unable to read audio duration from {audio_path}")
+    hours, minutes, seconds = match.groups()
+    info = {'duration': int(hours) * 3600 + int(minutes) * 60 + float(seconds)}
+    stream = re.search(r'Audio: (\w+).*?(\d+) Hz(?:, (mono|stereo))?', header)
+    if stream:
+        info['codec_name'] = stream.group(1)
+        info['sample_rate'] = stream.group(2)
+        info['channels'] = {'mono': 1, 'stereo': 2}.get(stream.group(3))
+    return info
+
+@lru_cache(maxsize=256)
+def _probe_cached(audio_path, mtime_ns, size):
+    logger.info(f"Probing audio metadata: {audio_path}")
+    stream = get_stream(audio_path) if is_remote(audio_path) else None
+    if stream and stream['duration']:
+        # 遠端串流直接使用 yt-dlp 已提供的長度，不需要再連線探測
+        info = {'duration': stream['duration'], 'format_name': stream['ext']}
+    elif is_remote(audio_path):
+        info = {}
+    else:
+        from pydub.utils import mediainfo
+        try:
+            info = mediainfo(audio_path)
+        except OSError:
+            info = {}
+    if not info.get('duration'):
+        info = _probe_with_ffmpeg(audio_path)
+    return {
+        'duration': float(info.get('duration') or 0),
+        'format': info.get('format_name') or source_extension(audio_path),
+        'codec': info.get('codec_name'),
+        'sample_rate': int(info['sample_rate']) if info.get('sample_rate') else None,
+        'channels': int(info['channels']) if info.get('channels') else None,
+        'bit_rate': int(info['bit_rate']) if info.get('bit_rate') else None,
+        'size': size,
+    }
+
+def probe_audio(audio_path):
+    # 以路徑、修改時間與大小作為快取鍵，同一個檔案只探測一次
+    return dict(_probe_cached(*_file_key(audio_path)))
+
+def get_audio_duration(audio_path):
+    # 只讀取容器資訊，不解碼音訊
+    return probe_audio(audio_path)['duration']
+
+@lru_cache(maxsize=64)
+def _silence_plan_cached(audio_path, mtime_ns, size, max_duration_seconds, search_seconds):
+    total_duration = get_audio_duration(audio_path)
+    return tuple(plan_silence_aware_chunks(audio_path, total_duration, max_duration_seconds, search_seconds))
+
+def plan_chunks(audio_path, max_duration_seconds=600, split_on_silence=SPLIT_ON_SILENCE):
+    if split_on_silence:
+        # 邊界移到停頓處，只需解碼每個邊界前的一小段音訊
+        return list(_silence_plan_cached(*_file_key(audio_path), max_duration_seconds, SILENCE_SEARCH_SECONDS))
+    total_duration = get_audio_duration(audio_path)
+    chunk_count = math.ceil(total_duration / max_duration_seconds) if total_duration else 0
+    return [
+        (i * max_duration_seconds, min((i + 1) * max_duration_seconds, total_duration))
+        for i in range(chunk_count)
+    ]
+
+@lru_cache(maxsize=256)
+def _speech_spans_cached(audio_path, mtime_ns, size, start, end, min_silence_seconds):
+    energies = frame_energy_db(audio_path, start, end - start)
+    return tuple((round(float(start + span_start), 3), round(float(min(end, start + span_end)), 3)) for span_start, span_end in speech_spans(energies, min_silence_seconds=min_silence_seconds))
+
+def chunk_speech_spans(audio_path, start, end, min_silence_seconds=STRIP_MIN_SILENCE_SECONDS):
+    # 回傳 chunk 內需保留的語音區段（原始影片中的秒數），結果會被快取
+    return list(_speech_spans_cached(*_file_key(audio_path), start, end, min_silence_seconds))
+
+def extract_segment(audio_path, start, end, output_format="mp3", output_path=None, keep_spans=None, encoding=None):
+    profile = ENCODING_PROFILES[encoding] if encoding else None
+    if profile:
+        output_format = profile['format']
+    # -ss 放在 -i 之前，ffmpeg 會直接在壓縮串流中定位，而不是從頭解碼
+    command = [
+        ffmpeg_binary(), '-hide_banner', '-loglevel', 'error', '-y',
+        '-ss', f"{start:.3f}", '-t', f"{end - start:.3f}",
+        *ffmpeg_input_args(audio_path),
+        '-vn',
+    ]
+    if keep_spans:
+        # 只保留語音區段；-ss 放在輸入前時時間軸從 0 開始，因此換算為相對時間
+        selection = '+'.join(f"between(t,{span_start - start:.3f},{span_end - start:.3f})" for span_start, span_end in keep_spans)
+        command += ['-af', f"aselect='{selection}',asetpts=N/SR/TB"]
+    if profile:
+        command += [
+            '-ac', str(profile['channels']), '-ar', str(profile['sample_rate']),
+            '-c:a', profile['codec'], '-b:a', str(profile['bitrate']),
+            *profile['options'],
+        ]
+    elif not keep_spans and source_extension(audio_path) == output_format:
+        # 格式相同時直接複製音訊幀，不需重新編碼
+        command += ['-c:a', 'copy']
+    command += ['-f', FFMPEG_FORMATS.get(output_format, output_format), output_path or 'pipe:1']
+
+    result = subprocess.run(command, capture_output=True)
+    if result.returncode != 0:
+        error = result.stderr.decode('utf-8', errors='replace').strip()
+        logger.error(f"ffmpeg failed to extract {start}s-{end}s from {audio_path}: {error}")
+        raise RuntimeError(f"ffmpeg failed to extract audio segment: {error}")
+    return result.stdout
+
+def iter_audio_chunks(audio_path, max_duration_seconds=600, output_format="mp3", as_buffers=False, chunk_ranges=None, strip_silence=False, encoding=None):
+    logger.info(f"Starting to stream audio chunks from: {audio_path}")
+    # 可只指定部分範圍，例如續傳時只切出尚未轉錄的 chunk
+    if chunk_ranges is None:
+        chunk_ranges = plan_chunks(audio_path, max_duration_seconds)
+    logger.info(f"Planned {len(chunk_ranges)} chunks of up to {max_duration_seconds}s")
+    if encoding:
+        output_format = ENCODING_PROFILES[encoding]['format']
+
+    # 每次切割使用不同的檔名後綴，同一份音訊同時有多個轉錄時不會刪到彼此的 chunk
+    run_id = uuid.uuid4().hex[:8]
+    for start, end in chunk_ranges:
+        chunk_filename = f"{chunk_prefix(audio_path)}_chunk_{int(start)}_{int(end)}_{run_id}.{output_format}"
+        logger.info(f"Exporting chunk: {int(start)}s to {int(end)}s")
+
+        keep_spans = None
+        if strip_silence:
+            keep_spans = chunk_speech_spans(audio_path, start, end)
+            kept = sum(span_end - span_start for span_start, span_end in keep_spans)
+            logger.info(f"Stripping silence: keeping {kept:.1f}s of {end - start:.1f}s")
+
+        if as_buffers:
+            buffer = io.BytesIO(extract_segment(audio_path, start, end, output_format, keep_spans=keep_spans, encoding=encoding))
+            buffer.name = os.path.basename(chunk_filename)
+            yield buffer
+        else:
+            extract_segment(audio_path, start, end, output_format, output_path=chunk_filename, keep_spans=keep_spans, encoding=encoding)
+            logger.info(f"Chunk saved as: {chunk_filename}")
+            yield chunk_filename
+
 def split_audio(audio_path, max_duration_seconds=600, output_format="mp3"):
     logger.info(f"Starting to split audio file: {audio_path}")
-    
-    # 載入音頻文件
-    audio = AudioSegment.from_file(audio_path)
-    total_duration = len(audio)
-    logger.info(f"Total audio duration: {total_duration/1000:.2f} seconds")
-
-    # 轉換最大持續時間為毫秒
-    max_duration_ms = max_duration_seconds * 1000
-
-    chunks = []
-    for start in range(0, total_duration, max_duration_ms):
-        end = min(start + max_duration_ms, total_duration)
-        
-        chunk = audio[start:end]
-        
-        # 生成輸出文件名
-        chunk_filename = f"{os.path.splitext(audio_path)[0]}_chunk_{start//1000}_{end//1000}.{output_format}"
-        
-        logger.info(f"Exporting chunk: {start//1000}s to {end//1000}s")
-        chunk.export(chunk_filename, format=output_format)
-        
-        chunks.append(chunk_filename)
-        
-        logger.info(f"Chunk saved as: {chunk_filename}")
-
+    chunks = list(iter_audio_chunks(audio_path, max_duration_seconds, output_format))
     logger.info(f"Audio splitting completed. Total chunks: {len(chunks)}")
     return chunks
 
-def estimate_transcription_cost(audio_path):
-    audio = AudioSegment.from_file(audio_path)
-    duration_minutes = len(audio) / 60000  # 轉換為分鐘
-    cost_per_minute = 0.006  # Whisper API 的價格（可能需要更新）
-    estimated_cost = duration_minutes * cost_per_minute
+def chunk_seconds_for_budget(audio_path, encoding=None, max_upload_bytes=24 * 1024 * 1024, max_chunk_seconds=None):
+    # 依編碼位元率推算單一 chunk 在上傳大小限制內可容納的秒數
+    if encoding:
+        bytes_per_second = ENCODING_PROFILES[encoding]['bitrate'] / 8
+    else:
+        info = probe_audio(audio_path)
+        if info['bit_rate']:
+            bytes_per_second = info['bit_rate'] / 8
+        else:
+            bytes_per_second = info['size'] / max(info['duration'], 1)
+    if not bytes_per_second:
+        # 無法得知位元率（例如遠端串流沿用原始格式）時，使用保守的預設長度
+        return max_chunk_seconds or 600
+    seconds = max(MIN_CHUNK_SECONDS, int(max_upload_bytes * UPLOAD_SIZE_MARGIN / bytes_per_second))
+    if max_chunk_seconds:
+        seconds = min(seconds, max_chunk_seconds)
+    logger.info(f"Chunk duration for {encoding or 'source'} encoding within {max_upload_bytes} bytes: {seconds}s")
+    return seconds
+
+def estimate_transcription_cost(audio_path, service='openai'):
+    from src.metrics import transcription_cost
+    estimated_cost = transcription_cost(service, get_audio_duration(audio_path))
     logger.info(f"Estimated transcription cost for {audio_path}: ${estimated_cost:.2f}")
     return estimated_cost
 
@@ -46,4 +222,4 @@ if __name__ == "__main__":
     # 測試代碼
     audio_file = "path/to/your/audio/file.mp3"
     chunks = split_audio(audio_file)
-    estimate_transcription_cost(audio_file)
\ No newline at end of file
+    estimate_transcription_cost(audio_file)
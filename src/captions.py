@@ -0,0 +1,165 @@
+import re
+import json
+import html
+import logging
+from src import metrics
+from config.settings import CAPTIONS_ALLOW_AUTO, CAPTION_MIN_COVERAGE, CAPTION_MIN_CHARS_PER_MINUTE
+
+logger = logging.getLogger(__name__)
+
+# 依偏好排序；json3 有精確的時間資訊，vtt 為通用格式
+CAPTION_FORMATS = ['json3', 'vtt']
+# 每一行文字稿涵蓋的秒數，與 Whisper chunk 合併後的換行方式相近
+PARAGRAPH_SECONDS = 30
+MIN_OVERLAP_CHARS = 8
+
+VTT_TIMING = re.compile(r'(\d+:)?(\d{2}):(\d{2})\.(\d{3})\s+-->\s+(\d+:)?(\d{2}):(\d{2})\.(\d{3})')
+VTT_TAG = re.compile(r'<[^>]+>')
+ANNOTATION = re.compile(r'\[[^\]]*\]|\([^)]*(?:music|applause|laughter|音樂|掌聲|笑)[^)]*\)', re.IGNORECASE)
+CJK_END = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\u3000-\u303f\uff00-\uffef]$')
+CJK_START = re.compile(r'^[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\u3000-\u303f\uff00-\uffef]')
+
+def _vtt_seconds(hours, minutes, seconds, millis):
+    return int(hours[:-1] if hours else 0) * 3600 + int(minutes) * 60 + int(seconds) + int(millis) / 1000
+
+def parse_vtt(text):
+    # 回傳 (開始秒數, 結束秒數, 文字) 的 cue 清單
+    cues = []
+    lines = text.splitlines()
+    i = 0
+    while i < len(lines):
+        match = VTT_TIMING.search(lines[i])
+        if not match:
+            i += 1
+            continue
+        start = _vtt_seconds(*match.group(1, 2, 3, 4))
+        end = _vtt_seconds(*match.group(5, 6, 7, 8))
+        i += 1
+        body = []
+        # cue 以空行結束；YouTube 自動字幕第一行常是單一空白（捲動前的空行），仍屬於 cue 內容
+        while i < len(lines) and lines[i] and not VTT_TIMING.search(lines[i]):
+            body.append(VTT_TAG.sub('', lines[i]).strip())
+            i += 1
+        cues.append((start, end, " ".join(line for line in body if line)))
+    return cues
+
+def parse_json3(data):
+    if isinstance(data, (bytes, str)):
+        data = json.loads(data)
+    cues = []
+    for event in data.get('events', []):
+        segs = event.get('segs')
+        if not segs:
+            continue
+        text = ""
+        for line in "".join(seg.get('utf8', '') for seg in segs).split('\n'):
+            text = _join(text, line.strip()) if line.strip() else text
+        start = event.get('tStartMs', 0) / 1000
+        cues.append((start, start + event.get('dDurationMs', 0) / 1000, text))
+    return cues
+
+def _join(left, right):
+    if not left:
+        return right
+    # 中日韓文字之間不加空白
+    if CJK_END.search(left) and CJK_START.search(right):
+        return left + right
+    return left + " " + right
+
+def _overlap(previous, text):
+    # 自動字幕逐行捲動時，下一個 cue 會重複上一個 cue 的結尾；太短的重疊視為巧合不處理
+    for size in range(min(len(previous), len(text)), 0, -1):
+        if previous.endswith(text[:size]):
+            return size if size == len(text) or size >= MIN_OVERLAP_CHARS else 0
+    return 0
+
+def normalize_cues(cues):
+    # 移除 [音樂] 之類的註記與 HTML 實體，並去除自動字幕捲動造成的重複文字
+    lines = []
+    previous = ""
+    for start, end, text in cues:
+        text = ANNOTATION.sub('', html.unescape(text))
+        text = re.sub(r'\s+', ' ', text).strip()
+        if not text:
+            continue
+        remainder = text[_overlap(previous, text):].strip()
+        previous = text
+        if remainder:
+            lines.append((start, end, remainder))
+    return lines
+
+def cues_to_transcript(cues):
+    paragraphs = []
+    current, paragraph_start = "", None
+    for start, _, text in normalize_cues(cues):
+        if paragraph_start is None:
+            paragraph_start = start
+        elif start - paragraph_start >= PARAGRAPH_SECONDS:
+            paragraphs.append(current)
+            current, paragraph_start = "", start
+        current = _join(current, text)
+    if current:
+        paragraphs.append(current)
+    return "\n".join(paragraphs)
+
+def caption_quality_ok(cues, duration):
+    # 字幕需涵蓋大部分影片長度，且文字量不能太少（例如只有歌詞片段或片頭字卡）
+    if not cues:
+        return False
+    if not duration:
+        return True
+    coverage = max(end for _, end, _ in cues) / duration
+    chars = sum(len(text) for _, _, text in normalize_cues(cues))
+    chars_per_minute = chars / (duration / 60)
+    if coverage < CAPTION_MIN_COVERAGE or chars_per_minute < CAPTION_MIN_CHARS_PER_MINUTE:
+        logger.info(f"Captions rejected: coverage {coverage:.2f}, {chars_per_minute:.0f} chars/minute")
+        return False
+    return True
+
+def _matches_language(track_language, language):
+    track_language, language = track_language.lower(), language.lower()
+    return track_language == language or track_language.startswith(language + '-')
+
+def select_caption_track(info, language, allow_auto=CAPTIONS_ALLOW_AUTO):
+    # 優先使用人工字幕；自動字幕只接受原語言，不接受 YouTube 機器翻譯的版本（網址含 tlang）
+    sources = [('manual', info.get('subtitles') or {})]
+    if allow_auto:
+        sources.append(('auto', info.get('automatic_captions') or {}))
+    for kind, tracks in sources:
+        candidates = sorted(
+            (track_language for track_language in tracks if _matches_language(track_language, language)),
+            key=lambda track_language: (track_language.lower() != language.lower(), track_language)
+        )
+        for track_language in candidates:
+            formats = tracks[track_language]
+            if kind == 'auto':
+                formats = [fmt for fmt in formats if 'tlang=' not in (fmt.get('url') or '')]
+            for ext in CAPTION_FORMATS:
+                for fmt in formats:
+                    if fmt.get('ext') == ext and fmt.get('url'):
+                        return {'kind': kind, 'language': track_language, 'ext': ext, 'url': fmt['url']}
+    return None
+
+def parse_captions(payload, ext):
+    if isinstance(payload, bytes):
+        payload = payload.decode('utf-8')
+    return parse_json3(payload) if ext == 'json3' else parse_vtt(payload)
+
+def _download(url):
+    import yt_dlp
+    with yt_dlp.YoutubeDL({'quiet': True, 'logger': logger}) as ydl:
+        payload = ydl.urlopen(url).read()
+    metrics.record(bytes_downloaded=len(payload))
+    return payload
+
+def fetch_captions(info, language, allow_auto=CAPTIONS_ALLOW_AUTO, fetch=None):
+    # info 為 yt-dlp 的影片資訊；fetch 可替換成讀取錄製好的字幕檔，方便離線驗證
+    track = select_caption_track(info, language, allow_auto=allow_auto)
+    if track is None:
+        logger.info(f"No {language} captions available for {info.get('id')}")
+        return None
+    logger.info(f"Fetching {track['kind']} {track['language']} captions ({track['ext']}) for {info.get('id')}")
+    cues = parse_captions((fetch or _download)(track['url']), track['ext'])
+    if not caption_quality_ok(cues, info.get('duration')):
+        return None
+    return cues_to_transcript(cues)
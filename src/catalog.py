@@ -0,0 +1,136 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from contextlib import closing
+from config.settings import CATALOG_PATH
+
+logger = logging.getLogger(__name__)
+
+LEGACY_CATALOG_FILE = "processed_videos.json"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS summaries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    video_id TEXT NOT NULL,
+    summary_method TEXT NOT NULL,
+    summary_language TEXT NOT NULL,
+    model TEXT NOT NULL,
+    youtube_url TEXT,
+    title TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    UNIQUE (video_id, summary_method, summary_language, model)
+);
+CREATE INDEX IF NOT EXISTS idx_summaries_updated_at ON summaries (updated_at DESC);
+CREATE INDEX IF NOT EXISTS idx_summaries_video_id ON summaries (video_id);
+"""
+
+_initialized = set()
+_init_lock = threading.Lock()
+
+def connect(catalog_path=CATALOG_PATH):
+    # 每次操作各自開連線；WAL 模式讓多個 session 與背景工作可同時讀寫，寫入衝突時等待而不是失敗
+    directory = os.path.dirname(catalog_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(catalog_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA busy_timeout = 30000")
+    _ensure_schema(conn, catalog_path)
+    return conn
+
+def _ensure_schema(conn, catalog_path):
+    with _init_lock:
+        if catalog_path in _initialized:
+            return
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.executescript(SCHEMA)
+        _import_legacy_catalog(conn)
+        _initialized.add(catalog_path)
+
+def _import_legacy_catalog(conn, legacy_path=LEGACY_CATALOG_FILE):
+    # 舊版的 processed_videos.json 只在資料庫為空時匯入一次
+    if not os.path.exists(legacy_path):
+        return
+    if conn.execute("SELECT 1 FROM summaries LIMIT 1").fetchone():
+        return
+    with open(legacy_path, 'r') as f:
+        entries = json.load(f)
+
+    now = time.time()
+    rows = []
+    # 舊檔案最新的在最前面，依序給遞減的時間以保留原本的順序
+    for offset, (video_key, youtube_url) in enumerate(entries):
+        parts = video_key.rsplit('_', 3)
+        if len(parts) != 4:
+            logger.warning(f"Skipping unrecognized legacy catalog key: {video_key}")
+            continue
+        rows.append((*parts, youtube_url, now - offset, now - offset))
+    with conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO summaries "
+            "(video_id, summary_method, summary_language, model, youtube_url, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows
+        )
+    logger.info(f"Imported {len(rows)} entries from {legacy_path}")
+
+def record_summary(video_id, summary_method, summary_language, model, youtube_url=None, title=None, catalog_path=CATALOG_PATH):
+    now = time.time()
+    with closing(connect(catalog_path)) as conn, conn:
+        conn.execute(
+            "INSERT INTO summaries "
+            "(video_id, summary_method, summary_language, model, youtube_url, title, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (video_id, summary_method, summary_language, model) DO UPDATE SET "
+            "youtube_url = COALESCE(excluded.youtube_url, youtube_url), "
+            "title = COALESCE(excluded.title, title), "
+            "updated_at = excluded.updated_at",
+            (video_id, summary_method, summary_language, model, youtube_url, title, now, now)
+        )
+        row = conn.execute(
+            "SELECT * FROM summaries WHERE video_id = ? AND summary_method = ? AND summary_language = ? AND model = ?",
+            (video_id, summary_method, summary_language, model)
+        ).fetchone()
+    return dict(row)
+
+def delete_summary(video_id, summary_method, summary_language, model, catalog_path=CATALOG_PATH):
+    with closing(connect(catalog_path)) as conn, conn:
+        conn.execute(
+            "DELETE FROM summaries WHERE video_id = ? AND summary_method = ? AND summary_language = ? AND model = ?",
+            (video_id, summary_method, summary_language, model)
+        )
+
+def count_summaries(catalog_path=CATALOG_PATH):
+    with closing(connect(catalog_path)) as conn:
+        return conn.execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+
+def list_summaries(limit=20, offset=0, catalog_path=CATALOG_PATH):
+    with closing(connect(catalog_path)) as conn:
+        rows = conn.execute(
+            "SELECT * FROM summaries ORDER BY updated_at DESC, id DESC LIMIT ? OFFSET ?",
+            (limit, offset)
+        ).fetchall()
+    return [dict(row) for row in rows]
+
+def get_summary_entry(entry_id, catalog_path=CATALOG_PATH):
+    with closing(connect(catalog_path)) as conn:
+        row = conn.execute("SELECT * FROM summaries WHERE id = ?", (entry_id,)).fetchone()
+    return dict(row) if row else None
+
+def find_summary_entry(video_id, summary_method=None, summary_language=None, model=None, catalog_path=CATALOG_PATH):
+    # 未指定的欄位不過濾，回傳該影片最近一次更新的摘要
+    conditions, params = ["video_id = ?"], [video_id]
+    for column, value in (('summary_method', summary_method), ('summary_language', summary_language), ('model', model)):
+        if value:
+            conditions.append(f"{column} = ?")
+            params.append(value)
+    with closing(connect(catalog_path)) as conn:
+        row = conn.execute(
+            f"SELECT * FROM summaries WHERE {' AND '.join(conditions)} ORDER BY updated_at DESC LIMIT 1",
+            params
+        ).fetchone()
+    return dict(row) if row else None
@@ -0,0 +1,48 @@
+import os
+import hashlib
+import logging
+from functools import lru_cache
+from config.settings import ARTIFACT_PATH
+from src import artifacts
+
+logger = logging.getLogger(__name__)
+
+@lru_cache(maxsize=256)
+def _hash_file(audio_path, mtime_ns, size):
+    digest = hashlib.sha256()
+    with open(audio_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+def audio_fingerprint(audio_path):
+    # 以檔案內容計算雜湊，同一個檔案（路徑、修改時間、大小不變）只計算一次
+    audio_path = os.path.abspath(audio_path)
+    stat = os.stat(audio_path)
+    return _hash_file(audio_path, stat.st_mtime_ns, stat.st_size)
+
+class ChunkCheckpoints:
+    def __init__(self, audio_path, service, model, language, variant=None, source_id=None, store_path=ARTIFACT_PATH):
+        # source_id 用於無法計算檔案雜湊的來源（例如遠端串流），應能唯一識別音訊內容
+        self.audio_hash = source_id or audio_fingerprint(audio_path)
+        self.service = service
+        self.model = model
+        self.language = language
+        # variant 區分同一範圍的不同前處理（例如移除靜音）
+        self.variant = variant
+        self.store_path = store_path
+
+    def _params(self, start, end, **extra):
+        # 以音訊內容雜湊為命名空間，同一段音訊不論來自哪個檔案都共用 checkpoint
+        return {
+            'start': round(start, 3), 'end': round(end, 3), 'service': self.service, 'model': self.model,
+            'language': self.language, 'variant': self.variant, **extra
+        }
+
+    def load(self, start, end):
+        return artifacts.get_text(artifacts.CHUNK, self.audio_hash, self._params(start, end), self.store_path)
+
+    def save(self, start, end, text):
+        path = artifacts.put_text(artifacts.CHUNK, self.audio_hash, self._params(start, end), text, store_path=self.store_path)
+        logger.info(f"Checkpoint saved for chunk {start:.0f}s-{end:.0f}s: {path}")
+
@@ -0,0 +1,174 @@
+import os
+import time
+import random
+import logging
+import threading
+import email.utils
+import importlib
+from collections import OrderedDict
+from src import metrics
+from config.settings import (
+    PROVIDER_TIMEOUTS, PROVIDER_CONNECT_TIMEOUT_SECONDS, PROVIDER_MAX_RETRIES,
+    PROVIDER_RETRY_BASE_SECONDS, PROVIDER_RETRY_MAX_SECONDS, PROVIDER_MAX_CONNECTIONS
+)
+
+logger = logging.getLogger(__name__)
+
+# provider -> (模組, client 類別, API key 環境變數)；SDK 在第一次建立 client 時才載入
+PROVIDERS = {
+    'groq': ('groq', 'Groq', "GROQ_API_KEY"),
+    'openai': ('openai', 'OpenAI', "OPENAI_API_KEY"),
+}
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+RETRYABLE_ERRORS = ('APITimeoutError', 'APIConnectionError')
+
+# 使用者在介面輸入的 key（不是環境變數中的 key）最多保留幾個 client
+MAX_USER_KEY_CLIENTS = 4
+
+# (provider, api_key) -> client；跨請求與 Streamlit session 共用，保持 HTTP 連線不中斷。
+# 環境變數的 key 一直保留；使用者輸入的 key 依最近使用順序只保留 MAX_USER_KEY_CLIENTS 個，
+# 避免每組 key 的連線池與明文 key 永久留在記憶體中
+_clients = OrderedDict()
+_stats = {}
+_lock = threading.Lock()
+
+def _new_stats():
+    return {'requests': 0, 'retries': 0, 'failures': 0, 'total_seconds': 0.0}
+
+def get_client(provider, api_key=None):
+    if provider not in PROVIDERS:
+        logger.error("Unsupported service specified.")
+        raise ValueError("Unsupported service specified.")
+    module_name, class_name, key_name = PROVIDERS[provider]
+    api_key = api_key or os.environ.get(key_name)
+    if not api_key:
+        logger.error(f"{key_name} not found in environment.")
+        raise ValueError(f"{key_name} is not set")
+
+    user_key = api_key not in _env_keys()
+    with _lock:
+        client = _clients.get((provider, api_key))
+        if client is not None:
+            _clients.move_to_end((provider, api_key))
+        else:
+            logger.info(f"Creating pooled {provider} client")
+            import httpx
+            client_class = getattr(importlib.import_module(module_name), class_name)
+            timeout = httpx.Timeout(PROVIDER_TIMEOUTS[provider], connect=PROVIDER_CONNECT_TIMEOUT_SECONDS)
+            http_client = httpx.Client(
+                timeout=timeout,
+                limits=httpx.Limits(max_connections=PROVIDER_MAX_CONNECTIONS, max_keepalive_connections=PROVIDER_MAX_CONNECTIONS),
+            )
+            # 重試由 call_with_retries 統一處理
+            client = client_class(api_key=api_key, http_client=http_client, timeout=timeout, max_retries=0)
+            _clients[(provider, api_key)] = client
+            _stats.setdefault(provider, _new_stats())
+            if user_key:
+                _evict_user_clients()
+        return client
+
+def _env_keys():
+    # 環境變數中的 key，包含 GROQ_API_KEYS / OPENAI_API_KEYS 的多組 key
+    keys = set()
+    for _, _, key_name in PROVIDERS.values():
+        keys.add(os.environ.get(key_name))
+        keys.update(key.strip() for key in os.environ.get(f"{key_name}S", "").split(","))
+    keys.discard(None)
+    keys.discard("")
+    return keys
+
+def _evict_user_clients():
+    # 進行中的請求仍持有被移除的 client，不主動關閉，等沒有引用後由 GC 回收
+    env_keys = _env_keys()
+    user_keys = [key for key in _clients if key[1] not in env_keys]
+    for key in user_keys[:max(0, len(user_keys) - MAX_USER_KEY_CLIENTS)]:
+        del _clients[key]
+        logger.info(f"Dropped pooled {key[0]} client for a user-supplied key")
+
+def parse_retry_after(headers):
+    if not headers:
+        return None
+    retry_after_ms = headers.get('retry-after-ms')
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+    retry_after = headers.get('retry-after')
+    if not retry_after:
+        return None
+    try:
+        return float(retry_after)
+    except ValueError:
+        pass
+    retry_date = email.utils.parsedate_tz(retry_after)
+    if retry_date is None:
+        return None
+    return max(0.0, email.utils.mktime_tz(retry_date) - time.time())
+
+def is_retryable(error):
+    if type(error).__name__ in RETRYABLE_ERRORS:
+        return True
+    return getattr(error, 'status_code', None) in RETRYABLE_STATUS_CODES
+
+def retry_delay(attempt, error=None, base_delay=PROVIDER_RETRY_BASE_SECONDS, max_delay=PROVIDER_RETRY_MAX_SECONDS):
+    # 指數退避加上 full jitter；伺服器有提供 Retry-After 時至少等待該時間。
+    # Retry-After 超過 max_delay 時回傳 None：提早重試只會再收到 429，呼叫端應直接失敗
+    delay = random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+    response = getattr(error, 'response', None)
+    retry_after = parse_retry_after(getattr(response, 'headers', None))
+    if retry_after is not None:
+        if retry_after > max_delay:
+            return None
+        delay = max(delay, retry_after)
+    return delay
+
+def call_with_retries(provider, func, *args, max_retries=PROVIDER_MAX_RETRIES, base_delay=PROVIDER_RETRY_BASE_SECONDS, **kwargs):
+    stats = _stats.setdefault(provider, _new_stats())
+    for attempt in range(max_retries + 1):
+        started = time.perf_counter()
+        metrics.record(requests=1)
+        try:
+            result = func(*args, **kwargs)
+            with _lock:
+                stats['requests'] += 1
+                stats['total_seconds'] += time.perf_counter() - started
+            return result
+        except Exception as e:
+            with _lock:
+                stats['requests'] += 1
+                stats['total_seconds'] += time.perf_counter() - started
+            if attempt == max_retries or not is_retryable(e):
+                with _lock:
+                    stats['failures'] += 1
+                raise
+            delay = retry_delay(attempt, e, base_delay)
+            if delay is None:
+                with _lock:
+                    stats['failures'] += 1
+                logger.warning(f"{provider} asked to retry after more than {PROVIDER_RETRY_MAX_SECONDS:.0f}s, not retrying ({type(e).__name__}: {str(e)})")
+                raise
+            with _lock:
+                stats['retries'] += 1
+            metrics.record(retries=1)
+            logger.warning(f"{provider} request failed ({type(e).__name__}: {str(e)}), retrying in {delay:.1f}s ({attempt + 1}/{max_retries})")
+            time.sleep(delay)
+
+def pool_stats():
+    with _lock:
+        result = {}
+        for provider, stats in _stats.items():
+            entry = dict(stats)
+            entry['average_seconds'] = stats['total_seconds'] / stats['requests'] if stats['requests'] else 0.0
+            entry['clients'] = sum(1 for key in _clients if key[0] == provider)
+            # httpx 未公開連線池資訊，這裡盡量讀取底層 httpcore 的連線數
+            connections = 0
+            for (client_provider, _), client in _clients.items():
+                if client_provider != provider:
+                    continue
+                pool = getattr(getattr(client._client, '_transport', None), '_pool', None)
+                connections += len(getattr(pool, 'connections', []) or [])
+            entry['open_connections'] = connections
+            result[provider] = entry
+        return result
@@ -0,0 +1,123 @@
+import re
+import sys
+import logging
+from src.summarizer import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# 送去摘要前的文字稿壓縮：只移除對摘要沒有資訊量的內容，結果是確定性的（相同輸入一定得到相同輸出）。
+# 存檔與搜尋索引仍使用原始文字稿。
+
+# 前後兩個 chunk 的重疊部分至少要這麼長才移除，太短的重疊視為巧合
+MIN_BOUNDARY_OVERLAP_CHARS = 12
+BOUNDARY_SEARCH_CHARS = 300
+# Whisper 卡住時會重複同一組 1~3 句話
+MAX_REPEAT_CYCLE = 3
+
+WHITESPACE = re.compile(r'[ \t　\xa0]+')
+SENTENCE = re.compile(r'.+?(?:[。！？!?；;]+|\.+(?=\s|$)|$)\s*')
+NON_WORD = re.compile(r'[\W_]+')
+# 同一片段在一句話內連續重複四次以上（例如「我們我們我們我們」），只保留一次
+LOOP = re.compile(r'(.{2,30}?)\1{3,}')
+DIGITS_ONLY = re.compile(r'^[\d\W]+$')
+
+# Whisper 在靜音或音樂片段常見的幻覺：訓練資料中的字幕製作者署名，實際語音中不會出現
+HALLUCINATIONS = re.compile(
+    r'(?:字幕由\s*Amara\.org\s*社[區区]提供|(?:中文)?字幕\s*by\s*\S+|'
+    r'請不吝點贊\s*訂閱\s*轉發\s*打賞支持明鏡與點點欄目|请不吝点赞\s*订阅\s*转发\s*打赏支持明镜与点点栏目|'
+    r'Subtitles by the Amara\.org community)[。.!！]?',
+    re.IGNORECASE
+)
+
+# 語助詞；只收錄沒有其他意思的詞，避免改變語意。英文語助詞前後必須是空白或標點，不會切到 uh-oh 這類連字號詞
+FILLERS = re.compile(
+    r'(?<![\w-])(?:u+m+|u+h+|uhm+|erm+|hmm+)(?![\w-])[,.]?\s*|'
+    r'[嗯呃]+[，,、]?\s*|'
+    r'(?:えーと|えっと|えー+|あのー+)[、,]?\s*',
+    re.IGNORECASE
+)
+ORPHAN_COMMA = re.compile(r'(^|[。！？!?；;.]\s*)[，,、]\s*')
+
+def _sentence_key(sentence):
+    return NON_WORD.sub('', sentence.lower())
+
+def _collapse_loop(match):
+    unit = match.group(1)
+    # 數字（例如 1000000）不視為重複
+    return match.group(0) if DIGITS_ONLY.match(unit) else unit
+
+def _clean_line(line, stats):
+    line = WHITESPACE.sub(' ', line).strip()
+    line, count = HALLUCINATIONS.subn('', line)
+    stats['hallucinations'] += count
+    line, count = FILLERS.subn('', line)
+    stats['fillers'] += count
+    line = ORPHAN_COMMA.sub(r'\1', line)
+    collapsed = LOOP.sub(_collapse_loop, line)
+    if collapsed != line:
+        stats['loops'] += 1
+    return WHITESPACE.sub(' ', collapsed).strip()
+
+def _boundary_overlap(previous, line):
+    # chunk 邊界附近的語音可能同時出現在前一段結尾與下一段開頭
+    tail = previous[-BOUNDARY_SEARCH_CHARS:]
+    for size in range(min(len(tail), len(line)), MIN_BOUNDARY_OVERLAP_CHARS - 1, -1):
+        if tail.endswith(line[:size]):
+            return size
+    return 0
+
+def _drop_repeats(lines, stats):
+    # 依句子比對（忽略大小寫、標點與空白），連續重複的 1~3 句只保留第一次；跨行同樣適用
+    items = [(n, _sentence_key(sentence), sentence) for n, line in enumerate(lines) for sentence in SENTENCE.findall(line)]
+    kept = []
+    i = 0
+    while i < len(items):
+        for cycle in range(1, min(MAX_REPEAT_CYCLE, len(kept), len(items) - i) + 1):
+            keys = [key for _, key, _ in items[i:i + cycle]]
+            if all(keys) and keys == [key for _, key, _ in kept[-cycle:]]:
+                stats['duplicate_sentences'] += cycle
+                i += cycle
+                break
+        else:
+            kept.append(items[i])
+            i += 1
+    compacted = [[] for _ in lines]
+    for n, _, sentence in kept:
+        compacted[n].append(sentence)
+    return ["".join(parts).strip() for parts in compacted]
+
+def compact_transcript(transcript):
+    stats = {'hallucinations': 0, 'fillers': 0, 'loops': 0, 'boundary_overlaps': 0, 'duplicate_sentences': 0}
+    lines = []
+    for line in transcript.splitlines():
+        line = _clean_line(line, stats)
+        if not line:
+            continue
+        if lines:
+            overlap = _boundary_overlap(lines[-1], line)
+            if overlap:
+                stats['boundary_overlaps'] += 1
+                line = line[overlap:].lstrip()
+                if not line:
+                    continue
+        lines.append(line)
+    compacted = "\n".join(line for line in _drop_repeats(lines, stats) if line)
+
+    stats['chars_before'] = len(transcript)
+    stats['chars_after'] = len(compacted)
+    stats['tokens_before'] = estimate_tokens(transcript)
+    stats['tokens_after'] = estimate_tokens(compacted)
+    stats['tokens_saved'] = stats['tokens_before'] - stats['tokens_after']
+    logger.info(
+        f"Transcript compacted: {stats['tokens_before']} -> {stats['tokens_after']} tokens "
+        f"({stats['tokens_saved']} saved; {stats['duplicate_sentences']} repeated sentences, "
+        f"{stats['boundary_overlaps']} chunk overlaps, {stats['hallucinations']} hallucinated lines, {stats['fillers']} fillers)"
+    )
+    return compacted, stats
+
+if __name__ == "__main__":
+    # python -m src.compaction data/transcripts/<video_id>.txt：印出壓縮結果與統計
+    with open(sys.argv[1], 'r', encoding='utf-8') as f:
+        compacted, stats = compact_transcript(f.read())
+    print(compacted)
+    print(stats, file=sys.stderr)
@@ -1,7 +1,7 @@
-import yt_dlp
 import os
 import logging
 from config.settings import AUDIO_PATH
+from src.media import register_stream
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -9,35 +9,83 @@ load_dotenv()
 
 logger = logging.getLogger(__name__)
 
-def download_audio(url, audio_path=AUDIO_PATH, video_name=None):
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+# 原始音訊串流的副檔名，依偏好排序
+NATIVE_AUDIO_EXTENSIONS = ['m4a', 'webm', 'opus', 'ogg', 'mp3']
+
+def download_audio(url, audio_path=AUDIO_PATH, video_name=None, format_id=None, info=None, transcode=True):
     logger.info(f"Starting download process for URL: {url}")
 
     ydl_opts = {
-        'format': 'bestaudio/best',
+        'format': f"{format_id}/bestaudio/best" if format_id else 'bestaudio/best',
         'outtmpl': os.path.join(audio_path, f'{video_name}.%(ext)s'),
-        'postprocessors': [{
-            'key': 'FFmpegExtractAudio',
-            'preferredcodec': 'mp3',
-            'preferredquality': '192',
-        }],
         'logger': logger,
         'progress_hooks': [logging_hook],
-        'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+        'user-agent': USER_AGENT,
         'username': os.getenv('YOUTUBE_USERNAME'),
         'password': os.getenv('YOUTUBE_PASSWORD'),
     }
+    if transcode:
+        ydl_opts['postprocessors'] = [{
+            'key': 'FFmpegExtractAudio',
+            'preferredcodec': 'mp3',
+            'preferredquality': '192',
+        }]
 
+    import yt_dlp
     try:
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            logger.info("Extracting video information...")
-            ydl.download([url])
-            final_filename = os.path.join(audio_path, f'{video_name}.mp3')
+            if info is not None:
+                # 直接使用已探測過的影片資訊下載，不再重新解析頁面
+                try:
+                    result = ydl.process_ie_result(ydl.sanitize_info(info), download=True)
+                except yt_dlp.utils.DownloadError as e:
+                    logger.warning(f"Download from cached info failed, retrying with URL: {str(e)}")
+                    result = ydl.extract_info(url, download=True)
+            else:
+                logger.info("Extracting video information...")
+                result = ydl.extract_info(url, download=True)
+
+            if transcode:
+                final_filename = os.path.join(audio_path, f'{video_name}.mp3')
+            else:
+                # 不轉檔時保留 yt-dlp 下載的原始格式（m4a/webm 等）
+                final_filename = os.path.join(audio_path, f"{video_name}.{result.get('ext') or 'm4a'}")
             logger.info(f"Download completed. File saved as: {final_filename}")
             return final_filename
     except Exception as e:
         logger.error(f"An error occurred during download: {str(e)}")
         raise
 
+def find_downloaded_audio(audio_path, video_name):
+    for ext in NATIVE_AUDIO_EXTENSIONS:
+        candidate = os.path.join(audio_path, f"{video_name}.{ext}")
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+def open_audio_stream(url, video_name, format_id=None, info=None):
+    # 不下載，只取得音訊串流的直接網址；之後由 ffmpeg 以 HTTP range 請求切出各個 chunk
+    if info is None or not info.get('url'):
+        import yt_dlp
+        ydl_opts = {
+            'format': f"{format_id}/bestaudio/best" if format_id else 'bestaudio/best',
+            'quiet': True,
+            'logger': logger,
+            'user-agent': USER_AGENT,
+        }
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info = ydl.extract_info(url, download=False)
+    logger.info(f"Streaming audio format {info.get('format_id')} ({info.get('ext')}) for {video_name}")
+    return register_stream(
+        info['url'],
+        http_headers=info.get('http_headers'),
+        duration=info.get('duration'),
+        name=video_name,
+        ext=info.get('ext')
+    )
+
 def logging_hook(d):
     if d['status'] == 'downloading':
         percent = d['_percent_str']
@@ -0,0 +1,180 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from config.settings import JOBS_PATH, JOB_MAX_WORKERS, JOB_RETENTION_SECONDS
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+INTERRUPTED = "interrupted"
+
+FINISHED_STATUSES = (SUCCEEDED, FAILED, INTERRUPTED)
+
+def job_key(video_id, stage, params):
+    payload = json.dumps({'video_id': video_id, 'stage': stage, 'params': params}, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+# key -> [Lock, 使用中的工作數]
+_stage_locks = {}
+_stage_locks_lock = threading.Lock()
+
+@contextmanager
+def single_flight(video_id, stage, params=None):
+    # 工作內單一階段的合併：摘要參數不同的工作仍共用同一次下載與轉錄。
+    # 後到的工作等先到的完成後再執行，屆時結果已在 artifact store 中，直接沿用
+    key = job_key(video_id, stage, params or {})
+    with _stage_locks_lock:
+        entry = _stage_locks.setdefault(key, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        if not entry[0].acquire(blocking=False):
+            logger.info(f"Waiting for in-flight {stage} of {video_id}")
+            entry[0].acquire()
+        try:
+            yield
+        finally:
+            entry[0].release()
+    finally:
+        with _stage_locks_lock:
+            entry[1] -= 1
+            if not entry[1]:
+                del _stage_locks[key]
+
+class JobManager:
+    def __init__(self, max_workers=JOB_MAX_WORKERS, jobs_path=JOBS_PATH, retention_seconds=JOB_RETENTION_SECONDS):
+        self.jobs_path = jobs_path
+        self.retention_seconds = retention_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._jobs = {}
+        # key -> job_id；相同影片、階段與參數的工作在執行中時只會有一個
+        self._inflight = {}
+
+    def submit(self, video_id, stage, params, func, **kwargs):
+        key = job_key(video_id, stage, params)
+        with self._lock:
+            self._evict_finished()
+            if key in self._inflight:
+                job_id = self._inflight[key]
+                logger.info(f"Coalesced {stage} job for {video_id} into in-flight job {job_id}")
+                return job_id
+
+            job_id = uuid.uuid4().hex[:12]
+            now = time.time()
+            job = {
+                'job_id': job_id,
+                'key': key,
+                'video_id': video_id,
+                'stage': stage,
+                'params': params,
+                'status': QUEUED,
+                'progress': {},
+                'result': None,
+                'error': None,
+                'created_at': now,
+                'updated_at': now,
+            }
+            self._jobs[job_id] = job
+            self._inflight[key] = job_id
+            self._persist(job)
+
+        logger.info(f"Submitted {stage} job {job_id} for {video_id}")
+        self._executor.submit(self._run, job_id, func, kwargs)
+        return job_id
+
+    def get(self, job_id):
+        with self._lock:
+            self._evict_finished()
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return json.loads(json.dumps(job))
+        return self._load(job_id)
+
+    def report(self, job_id, persist=True, **progress):
+        with self._lock:
+            job = self._jobs[job_id]
+            job['progress'].update(progress)
+            job['updated_at'] = time.time()
+            if persist:
+                self._persist(job)
+
+    def _run(self, job_id, func, kwargs):
+        with self._lock:
+            key = self._jobs[job_id]['key']
+        self._update(job_id, status=RUNNING)
+
+        def report(persist=True, **progress):
+            self.report(job_id, persist=persist, **progress)
+
+        try:
+            # job_id 讓工作函式的計量紀錄（src/metrics.py）能對應回這個工作
+            result = func(report=report, job_id=job_id, **kwargs)
+            self._update(job_id, status=SUCCEEDED, result=result)
+            logger.info(f"Job {job_id} succeeded")
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {str(e)}")
+            self._update(job_id, status=FAILED, error=str(e))
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(fields)
+            job['updated_at'] = time.time()
+            if job['status'] in FINISHED_STATUSES:
+                # 結束後摘要已存檔，不再保留逐字更新的內容
+                job['progress'].pop('partial', None)
+            self._persist(job)
+
+    def _evict_finished(self):
+        # 已結束的工作超過保留時間後移出記憶體；get() 之後改讀已存檔的紀錄
+        cutoff = time.time() - self.retention_seconds
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job['status'] in FINISHED_STATUSES and job['updated_at'] < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _job_file(self, job_id):
+        return os.path.join(self.jobs_path, f"{job_id}.json")
+
+    def _persist(self, job):
+        # partial 是逐字更新的摘要內容，只保留在記憶體中
+        state = dict(job, progress={k: v for k, v in job['progress'].items() if k != 'partial'})
+        os.makedirs(self.jobs_path, exist_ok=True)
+        path = self._job_file(job['job_id'])
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _load(self, job_id):
+        try:
+            with open(self._job_file(job_id), 'r', encoding='utf-8') as f:
+                job = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # 不在本程序記憶體中、卻尚未結束的工作，表示先前的程序已中止
+        if job['status'] not in FINISHED_STATUSES:
+            job['status'] = INTERRUPTED
+        return job
+
+_manager = None
+_manager_lock = threading.Lock()
+
+def get_job_manager():
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager()
+        return _manager
@@ -0,0 +1,55 @@
+import logging
+import threading
+from config.settings import (
+    LOCAL_WHISPER_MODEL, LOCAL_WHISPER_DEVICE, LOCAL_WHISPER_COMPUTE_TYPE, LOCAL_WHISPER_WORKERS,
+    LOCAL_WHISPER_CPU_THREADS, LOCAL_WHISPER_BATCH_SIZE, LOCAL_WHISPER_BEAM_SIZE, LOCAL_WHISPER_DOWNLOAD_ROOT
+)
+
+logger = logging.getLogger(__name__)
+
+# 本機 CPU 語音轉錄（faster-whisper / CTranslate2）。faster-whisper 是選用套件，只在第一次使用 service='local' 時載入：
+#   pip install faster-whisper
+
+# (模型, 裝置, 精度) -> (WhisperModel, 批次推論 pipeline)；模型常駐於程序中，跨 chunk 與工作共用
+_models = {}
+_lock = threading.Lock()
+
+def _load_faster_whisper():
+    try:
+        import faster_whisper
+    except ImportError as e:
+        raise RuntimeError("Local transcription requires the faster-whisper package: pip install faster-whisper") from e
+    return faster_whisper
+
+def get_model(model_name=LOCAL_WHISPER_MODEL, device=LOCAL_WHISPER_DEVICE, compute_type=LOCAL_WHISPER_COMPUTE_TYPE):
+    key = (model_name, device, compute_type)
+    with _lock:
+        entry = _models.get(key)
+        if entry is None:
+            faster_whisper = _load_faster_whisper()
+            logger.info(f"Loading local Whisper model {model_name} ({device}, {compute_type}) with {LOCAL_WHISPER_WORKERS} workers")
+            # num_workers 讓多個執行緒可同時呼叫 transcribe；cpu_threads 為每個 worker 使用的核心數
+            model = faster_whisper.WhisperModel(
+                model_name, device=device, compute_type=compute_type,
+                num_workers=LOCAL_WHISPER_WORKERS, cpu_threads=LOCAL_WHISPER_CPU_THREADS,
+                download_root=LOCAL_WHISPER_DOWNLOAD_ROOT
+            )
+            # 新版 faster-whisper 可將同一個 chunk 內的多個 30 秒視窗合併成一批推論
+            pipeline_class = getattr(faster_whisper, 'BatchedInferencePipeline', None)
+            pipeline = pipeline_class(model=model) if pipeline_class and LOCAL_WHISPER_BATCH_SIZE > 1 else None
+            entry = (model, pipeline)
+            _models[key] = entry
+        return entry
+
+def transcribe(audio_path, language=None):
+    model, pipeline = get_model()
+    if pipeline is not None:
+        segments, info = pipeline.transcribe(
+            audio_path, language=language, beam_size=LOCAL_WHISPER_BEAM_SIZE, batch_size=LOCAL_WHISPER_BATCH_SIZE
+        )
+    else:
+        segments, info = model.transcribe(audio_path, language=language, beam_size=LOCAL_WHISPER_BEAM_SIZE)
+    # segments 是 generator，實際的解碼在這裡進行；與 API 的 text 輸出相同，直接串接各段文字
+    text = "".join(segment.text for segment in segments).strip()
+    logger.info(f"Local transcription of {info.duration:.0f}s audio completed ({len(text)} characters)")
+    return text
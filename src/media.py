@@ -0,0 +1,56 @@
+import os
+import hashlib
+import threading
+from functools import lru_cache
+from config.settings import AUDIO_PATH
+
+# 遠端串流（例如 YouTube 的音訊網址）需要的 HTTP headers 與已知資訊
+_streams = {}
+_streams_lock = threading.Lock()
+
+@lru_cache(maxsize=1)
+def ffmpeg_binary():
+    # pydub 在 import 時會搜尋 ffmpeg，延後到第一次使用時才載入
+    from pydub.utils import get_encoder_name
+    return get_encoder_name()
+
+def is_remote(source):
+    return source.startswith(('http://', 'https://'))
+
+def register_stream(url, http_headers=None, duration=None, name=None, ext=None):
+    with _streams_lock:
+        _streams[url] = {
+            'http_headers': http_headers or {},
+            'duration': duration,
+            'name': name or hashlib.sha256(url.encode('utf-8')).hexdigest()[:16],
+            'ext': ext,
+        }
+    return url
+
+def get_stream(url):
+    with _streams_lock:
+        return _streams.get(url)
+
+def ffmpeg_input_args(source):
+    # 遠端來源需帶上 yt-dlp 提供的 headers，ffmpeg 會以 HTTP range 請求定位
+    args = []
+    stream = get_stream(source) if is_remote(source) else None
+    if stream and stream['http_headers']:
+        headers = "".join(f"{key}: {value}\r\n" for key, value in stream['http_headers'].items())
+        args += ['-headers', headers]
+    return args + ['-i', source]
+
+def source_extension(source):
+    if is_remote(source):
+        stream = get_stream(source)
+        return (stream or {}).get('ext') or ''
+    return os.path.splitext(source)[1].lstrip('.').lower()
+
+def chunk_prefix(source):
+    # chunk 檔名前綴；遠端來源寫到 AUDIO_PATH 下
+    if is_remote(source):
+        stream = get_stream(source)
+        name = stream['name'] if stream else hashlib.sha256(source.encode('utf-8')).hexdigest()[:16]
+        os.makedirs(AUDIO_PATH, exist_ok=True)
+        return os.path.join(AUDIO_PATH, name)
+    return os.path.splitext(source)[0]
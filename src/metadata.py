@@ -0,0 +1,175 @@
+import os
+import re
+import json
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from urllib.parse import urlparse, parse_qs
+from config.settings import (
+    METADATA_PATH, METADATA_TTL_SECONDS, METADATA_MEMORY_CACHE_SIZE, METADATA_INFO_MAX_AGE_SECONDS
+)
+
+logger = logging.getLogger(__name__)
+
+VIDEO_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{11}$')
+
+# video_id -> (fetched_at, metadata, info)；info 是 yt-dlp 的完整結果（含所有格式與字幕，每部影片約 1 MB），只保留在記憶體中。
+# 依最近使用排序，最多 METADATA_MEMORY_CACHE_SIZE 部影片；info 超過 METADATA_INFO_MAX_AGE_SECONDS 後就丟棄
+_memory_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def extract_video_id(url):
+    url = url.strip()
+    if VIDEO_ID_PATTERN.match(url):
+        return url
+
+    parsed = urlparse(url if '://' in url else f"https://{url}")
+    host = (parsed.hostname or '').lower()
+    path_parts = [part for part in parsed.path.split('/') if part]
+
+    if host.endswith('youtu.be') and path_parts:
+        candidate = path_parts[0]
+    elif 'youtube' in host:
+        query = parse_qs(parsed.query)
+        if 'v' in query:
+            candidate = query['v'][0]
+        elif len(path_parts) >= 2 and path_parts[0] in ('shorts', 'embed', 'live', 'v', 'e'):
+            candidate = path_parts[1]
+        else:
+            candidate = None
+    else:
+        candidate = None
+
+    if candidate and VIDEO_ID_PATTERN.match(candidate):
+        return candidate
+    raise ValueError(f"Unable to extract YouTube video ID from URL: {url}")
+
+def canonical_url(video_id):
+    return f"https://www.youtube.com/watch?v={video_id}"
+
+def is_single_video_url(url):
+    # watch?v=...&list=... 視為單一影片；/playlist、頻道等網址需要展開
+    parsed = urlparse(url if '://' in url else f"https://{url}")
+    if parsed.path.rstrip('/').endswith('/playlist'):
+        return False
+    try:
+        extract_video_id(url)
+        return True
+    except ValueError:
+        return False
+
+def list_playlist_videos(url, max_depth=2):
+    # 以 extract_flat 只列出影片清單，不解析每部影片；頻道首頁會先展開成各個分頁（影片、直播等）
+    import yt_dlp
+    ydl_opts = {'quiet': True, 'extract_flat': 'in_playlist', 'logger': logger}
+    videos = []
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        pending = [(url, 0)]
+        while pending:
+            current, depth = pending.pop(0)
+            info = ydl.extract_info(current, download=False)
+            for entry in info.get('entries') or []:
+                if not entry:
+                    continue
+                entry_id = entry.get('id')
+                if entry.get('ie_key') == 'Youtube' or (entry_id and VIDEO_ID_PATTERN.match(entry_id) and entry.get('_type') != 'playlist'):
+                    videos.append({
+                        'video_id': entry_id,
+                        'url': canonical_url(entry_id),
+                        'title': entry.get('title'),
+                        'duration': entry.get('duration'),
+                    })
+                elif entry.get('url') and depth < max_depth:
+                    pending.append((entry['url'], depth + 1))
+    logger.info(f"Listed {len(videos)} videos from {url}")
+    return videos
+
+def _metadata_file(video_id):
+    return os.path.join(METADATA_PATH, f"{video_id}.json")
+
+def _probe(video_id):
+    logger.info(f"Probing video metadata for {video_id}")
+    import yt_dlp
+    ydl_opts = {'quiet': True, 'format': 'bestaudio/best', 'logger': logger}
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = ydl.extract_info(canonical_url(video_id), download=False)
+    metadata = {
+        'video_id': video_id,
+        'title': info.get('title') or video_id,
+        'duration': info.get('duration') or 0,
+        'channel': info.get('channel') or info.get('uploader'),
+        'format_id': info.get('format_id'),
+        'ext': info.get('ext'),
+        'abr': info.get('abr'),
+        'webpage_url': info.get('webpage_url') or canonical_url(video_id),
+        'fetched_at': time.time(),
+    }
+    return metadata, info
+
+def _save_metadata(metadata):
+    os.makedirs(METADATA_PATH, exist_ok=True)
+    path = _metadata_file(metadata['video_id'])
+    # 同一部影片可能同時被探測，每次寫入使用不同的暫存檔
+    tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def _cache_get(video_id):
+    # 呼叫時需持有 _cache_lock
+    cached = _memory_cache.get(video_id)
+    if cached is None:
+        return None
+    _memory_cache.move_to_end(video_id)
+    if cached[2] is not None and time.time() - cached[0] >= METADATA_INFO_MAX_AGE_SECONDS:
+        cached = _memory_cache[video_id] = (cached[0], cached[1], None)
+    return cached
+
+def _cache_put(video_id, entry):
+    # 呼叫時需持有 _cache_lock
+    _memory_cache[video_id] = entry
+    _memory_cache.move_to_end(video_id)
+    while len(_memory_cache) > METADATA_MEMORY_CACHE_SIZE:
+        _memory_cache.popitem(last=False)
+
+def load_cached_metadata(video_id):
+    # 不檢查 TTL，只讀本地快取；用於顯示標題等不需要最新資料的地方
+    with _cache_lock:
+        cached = _cache_get(video_id)
+    if cached:
+        return cached[1]
+    try:
+        with open(_metadata_file(video_id), 'r', encoding='utf-8') as f:
+            metadata = json.load(f)
+    except (OSError, ValueError):
+        return None
+    with _cache_lock:
+        if video_id not in _memory_cache:
+            _cache_put(video_id, (metadata['fetched_at'], metadata, None))
+    return metadata
+
+def get_video_metadata(url, ttl=METADATA_TTL_SECONDS, force=False):
+    video_id = extract_video_id(url)
+    now = time.time()
+
+    if not force:
+        metadata = load_cached_metadata(video_id)
+        if metadata and now - metadata['fetched_at'] < ttl:
+            logger.info(f"Using cached metadata for {video_id}")
+            return metadata
+
+    metadata, info = _probe(video_id)
+    with _cache_lock:
+        _cache_put(video_id, (metadata['fetched_at'], metadata, info))
+    _save_metadata(metadata)
+    return metadata
+
+def get_cached_info(video_id, max_age=METADATA_INFO_MAX_AGE_SECONDS):
+    # yt-dlp 的下載網址會過期，只有最近在本程序內探測過的結果才能直接拿來下載
+    with _cache_lock:
+        cached = _cache_get(video_id)
+    if cached and cached[2] is not None and time.time() - cached[0] < max_age:
+        return cached[2]
+    return None
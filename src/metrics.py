@@ -0,0 +1,275 @@
+import os
+import sys
+import json
+import time
+import uuid
+import logging
+import resource
+import threading
+import contextvars
+from contextlib import contextmanager
+from config.settings import (
+    METRICS_PATH, TRANSCRIPTION_PRICES_PER_MINUTE, LLM_PRICES_PER_MILLION_TOKENS
+)
+
+logger = logging.getLogger(__name__)
+
+DOWNLOAD = "download"
+TRANSCRIBE = "transcribe"
+SUMMARIZE = "summarize"
+# 嘗試以字幕取代下載與轉錄；耗時很短，不計入進度
+CAPTIONS = "captions"
+
+# 進度條中各階段所佔的比例；被快取或字幕取代而跳過的階段直接算完成
+STAGE_WEIGHTS = {DOWNLOAD: 0.15, TRANSCRIBE: 0.6, SUMMARIZE: 0.25}
+
+COUNTERS = (
+    'bytes_downloaded', 'bytes_uploaded', 'audio_seconds', 'prompt_tokens', 'completion_tokens',
+    'cost_usd', 'cache_hits', 'cache_misses', 'requests', 'retries', 'hedges', 'compaction_tokens_saved',
+)
+
+# 目前執行中的 (JobMetrics, 階段)；下層模組透過 record() 記錄，不需要一路傳遞參數
+_current_stage = contextvars.ContextVar('metrics_stage', default=None)
+
+# 本程序所有工作的累計值，供 Prometheus 匯出
+_totals = {}
+_job_counts = {}
+_totals_lock = threading.Lock()
+
+def bind(func):
+    # 執行緒不會繼承 contextvars；送進執行緒或 executor 的函式先綁定目前的 context
+    context = contextvars.copy_context()
+
+    def wrapper(*args, **kwargs):
+        return context.copy().run(func, *args, **kwargs)
+    return wrapper
+
+def record(**counters):
+    current = _current_stage.get()
+    if current is not None:
+        current[0].record(current[1], **counters)
+
+def set_progress(done, total):
+    current = _current_stage.get()
+    if current is not None:
+        current[0].set_progress(current[1], done, total)
+
+def transcription_cost(service, audio_seconds):
+    return TRANSCRIPTION_PRICES_PER_MINUTE.get(service, 0.0) * audio_seconds / 60
+
+def llm_cost(model, prompt_tokens, completion_tokens):
+    prompt_price, completion_price = LLM_PRICES_PER_MILLION_TOKENS.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+def record_usage(model, usage):
+    # chat completion 回傳的 usage（串流時為最後一個 chunk）
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, 'prompt_tokens', 0) or 0
+    completion_tokens = getattr(usage, 'completion_tokens', 0) or 0
+    record(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+           cost_usd=llm_cost(model, prompt_tokens, completion_tokens))
+
+def _cpu_seconds():
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time(), children.ru_utime + children.ru_stime
+
+class JobMetrics:
+    def __init__(self, job_id=None, video_id=None, listener=None):
+        self.job_id = job_id
+        self.video_id = video_id
+        # listener(event) 在階段開始、結束與進度更新時呼叫，用來驅動 UI 的進度條
+        self.listener = listener
+        self.started_at = time.time()
+        self.status = "running"
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def _stage_entry(self, stage):
+        entry = self._stages.get(stage)
+        if entry is None:
+            entry = {'status': "pending", 'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'child_cpu_seconds': 0.0,
+                     'done': 0, 'total': 0, **{counter: 0 for counter in COUNTERS}}
+            self._stages[stage] = entry
+        return entry
+
+    def _emit(self, stage, status):
+        if self.listener is not None:
+            self.listener({'stage': stage, 'status': status, 'progress': self.progress()})
+
+    @contextmanager
+    def stage(self, stage):
+        with self._lock:
+            self._stage_entry(stage)['status'] = "running"
+        self._emit(stage, "running")
+        token = _current_stage.set((self, stage))
+        wall_start = time.perf_counter()
+        # CPU 時間以整個程序計算（包含 ffmpeg 子行程），同時執行多個工作時會互相計入
+        cpu_start, child_start = _cpu_seconds()
+        status = "failed"
+        try:
+            yield self
+            status = "done"
+        finally:
+            _current_stage.reset(token)
+            cpu_end, child_end = _cpu_seconds()
+            with self._lock:
+                entry = self._stage_entry(stage)
+                entry['status'] = status
+                entry['wall_seconds'] += time.perf_counter() - wall_start
+                entry['cpu_seconds'] += cpu_end - cpu_start
+                entry['child_cpu_seconds'] += child_end - child_start
+            _add_totals(stage, {'wall_seconds': time.perf_counter() - wall_start, 'cpu_seconds': cpu_end - cpu_start,
+                                'child_cpu_seconds': child_end - child_start})
+            self._emit(stage, status)
+
+    def skip(self, stage, status="cached"):
+        # status 為 "cached" 時整個階段由快取取得，"skipped" 表示不需要執行（例如改用字幕）
+        with self._lock:
+            entry = self._stage_entry(stage)
+            entry['status'] = status
+            if status == "cached":
+                entry['cache_hits'] += 1
+        if status == "cached":
+            _add_totals(stage, {'cache_hits': 1})
+        self._emit(stage, status)
+
+    def record(self, stage, **counters):
+        with self._lock:
+            entry = self._stage_entry(stage)
+            for counter, value in counters.items():
+                entry[counter] += value
+        _add_totals(stage, counters)
+
+    def set_progress(self, stage, done, total):
+        with self._lock:
+            entry = self._stage_entry(stage)
+            entry['done'], entry['total'] = done, total
+        self._emit(stage, "running")
+
+    def progress(self):
+        with self._lock:
+            progress = 0.0
+            for stage, weight in STAGE_WEIGHTS.items():
+                entry = self._stages.get(stage)
+                if entry is None:
+                    continue
+                if entry['status'] in ("done", "cached", "skipped"):
+                    progress += weight
+                elif entry['status'] == "running" and entry['total']:
+                    progress += weight * min(1.0, entry['done'] / entry['total'])
+            return min(1.0, progress)
+
+    def snapshot(self):
+        with self._lock:
+            stages = {stage: dict(entry) for stage, entry in self._stages.items()}
+        totals = {counter: sum(entry[counter] for entry in stages.values()) for counter in COUNTERS}
+        totals['wall_seconds'] = sum(entry['wall_seconds'] for entry in stages.values())
+        return {
+            'job_id': self.job_id,
+            'video_id': self.video_id,
+            'status': self.status,
+            'started_at': self.started_at,
+            'stages': stages,
+            'totals': totals,
+        }
+
+    def finish(self, status, metrics_path=METRICS_PATH):
+        self.status = status
+        with _totals_lock:
+            _job_counts[status] = _job_counts.get(status, 0) + 1
+        snapshot = self.snapshot()
+        name = self.job_id or f"{self.video_id}-{int(self.started_at)}"
+        # 匯出失敗只記錄，不影響工作本身的結果
+        try:
+            _write_atomic(os.path.join(metrics_path, "jobs", f"{name}.json"), json.dumps(snapshot, indent=2))
+            _write_atomic(os.path.join(metrics_path, "metrics.prom"), prometheus_text())
+        except Exception as e:
+            logger.error(f"Failed to export metrics for job {name}: {str(e)}")
+        return snapshot
+
+def _add_totals(stage, counters):
+    with _totals_lock:
+        for counter, value in counters.items():
+            _totals[(stage, counter)] = _totals.get((stage, counter), 0) + value
+
+def _write_atomic(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # 每次寫入使用不同的暫存檔，同時結束的工作不會互相搬走對方的檔案
+    tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+def prometheus_text():
+    with _totals_lock:
+        totals = dict(_totals)
+        job_counts = dict(_job_counts)
+    lines = [
+        "# HELP youtube_summary_jobs_total Finished analysis jobs by status.",
+        "# TYPE youtube_summary_jobs_total counter",
+    ]
+    lines += [f'youtube_summary_jobs_total{{status="{status}"}} {count}' for status, count in sorted(job_counts.items())]
+    for metric in ('wall_seconds', 'cpu_seconds', 'child_cpu_seconds') + COUNTERS:
+        name = f"youtube_summary_stage_{metric}_total"
+        lines.append(f"# TYPE {name} counter")
+        for (stage, counter), value in sorted(totals.items()):
+            if counter == metric:
+                lines.append(f'{name}{{stage="{stage}"}} {round(value, 6)}')
+    return "\n".join(lines) + "\n"
+
+def load_job_metrics(name, metrics_path=METRICS_PATH):
+    try:
+        with open(os.path.join(metrics_path, "jobs", f"{name}.json"), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+_server = None
+_server_lock = threading.Lock()
+
+def start_metrics_server(port, host="0.0.0.0"):
+    # /metrics 提供 Prometheus 文字格式，/jobs/<job_id> 提供單一工作的 JSON；每個程序只啟動一次
+    global _server
+    with _server_lock:
+        if _server is not None:
+            return _server
+        from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path == "/metrics":
+                    self._send(200, prometheus_text(), "text/plain; version=0.0.4")
+                elif self.path.startswith("/jobs/"):
+                    snapshot = load_job_metrics(os.path.basename(self.path))
+                    if snapshot is None:
+                        self._send(404, '{"error": "not found"}', "application/json")
+                    else:
+                        self._send(200, json.dumps(snapshot), "application/json")
+                else:
+                    self._send(404, '{"error": "not found"}', "application/json")
+
+            def _send(self, status, body, content_type):
+                payload = body.encode('utf-8')
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        _server = ThreadingHTTPServer((host, port), Handler)
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+        logger.info(f"Metrics server listening on {host}:{port}")
+        return _server
+
+if __name__ == "__main__":
+    # 印出最近一次寫入的 Prometheus 匯出檔，或指定工作的 JSON
+    if len(sys.argv) > 1:
+        print(json.dumps(load_job_metrics(sys.argv[1]), indent=2))
+    else:
+        with open(os.path.join(METRICS_PATH, "metrics.prom"), 'r', encoding='utf-8') as f:
+            print(f.read(), end="")
@@ -0,0 +1,59 @@
+import queue
+import logging
+import threading
+from src.metrics import bind
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+def run_pipeline(items, worker, workers=1, queue_size=1):
+    # 生產者執行緒從 items 取出工作放入有界佇列，workers 個消費者同時處理；
+    # 佇列滿時生產者會停下來等待，因此同時存在的工作數固定不超過 queue_size + workers
+    workers = max(1, workers)
+    work_queue = queue.Queue(maxsize=max(1, queue_size))
+    results = {}
+    errors = []
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for index, item in enumerate(items):
+                if stop.is_set():
+                    break
+                work_queue.put((index, item))
+        except Exception as e:
+            logger.error(f"Pipeline producer failed: {str(e)}")
+            errors.append(e)
+            stop.set()
+        finally:
+            for _ in range(workers):
+                work_queue.put(_DONE)
+
+    def consume():
+        while True:
+            entry = work_queue.get()
+            if entry is _DONE:
+                return
+            if stop.is_set():
+                # 發生錯誤後仍需清空佇列，讓生產者能夠結束
+                continue
+            index, item = entry
+            try:
+                results[index] = worker(index, item)
+            except Exception as e:
+                logger.error(f"Pipeline worker failed on item {index}: {str(e)}")
+                errors.append(e)
+                stop.set()
+
+    # 執行緒沿用呼叫端的 context，讓下層的 metrics.record() 記在同一個工作與階段
+    threads = [threading.Thread(target=bind(produce), name="pipeline-producer", daemon=True)]
+    threads += [threading.Thread(target=bind(consume), name=f"pipeline-worker-{i}", daemon=True) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        raise errors[0]
+    return [results[index] for index in sorted(results)]
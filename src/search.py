@@ -0,0 +1,162 @@
+import re
+import sys
+import time
+import logging
+import threading
+from contextlib import closing
+from config.settings import CATALOG_PATH
+from src.catalog import connect, list_summaries, count_summaries
+from src import artifacts
+
+logger = logging.getLogger(__name__)
+
+TRANSCRIPT = "transcript"
+SUMMARY = "summary"
+
+CJK_CHAR = re.compile(r'([\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff])')
+CJK_CLASS = r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]'
+CJK_PUNCTUATION = re.compile(r' *([\u3000-\u303f\uff00-\uffef]) *')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    video_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    summary_method TEXT NOT NULL DEFAULT '',
+    summary_language TEXT NOT NULL DEFAULT '',
+    model TEXT NOT NULL DEFAULT '',
+    title TEXT,
+    updated_at REAL NOT NULL,
+    UNIQUE (video_id, kind, summary_method, summary_language, model)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(title, content, tokenize='unicode61');
+"""
+
+_initialized = set()
+_init_lock = threading.Lock()
+
+def _connect(catalog_path):
+    conn = connect(catalog_path)
+    with _init_lock:
+        if catalog_path not in _initialized:
+            conn.executescript(SCHEMA)
+            _initialized.add(catalog_path)
+    return conn
+
+def _space_cjk(text):
+    # 中日韓文字之間沒有空白，逐字拆成 token；查詢時以片語比對相鄰的字，任意長度的詞都能使用索引
+    return CJK_CHAR.sub(r' \1 ', text or '')
+
+def _unspace_cjk(text, open_mark, close_mark):
+    # 還原 snippet：移除為了分詞插入的空白，並合併同一個詞被逐字標示的 highlight
+    marks = f"(?:{re.escape(open_mark)}|{re.escape(close_mark)})*" if open_mark or close_mark else ""
+    pattern = re.compile(f"({CJK_CLASS}{marks}) +({marks}{CJK_CLASS})")
+    previous = None
+    while previous != text:
+        previous, text = text, pattern.sub(r'\1\2', text)
+    if close_mark and open_mark:
+        text = re.sub(f"({CJK_CLASS}){re.escape(close_mark + open_mark)}({CJK_CLASS})", r'\1\2', text)
+    text = CJK_PUNCTUATION.sub(r'\1', text)
+    return re.sub(r' {2,}', ' ', text).strip()
+
+def index_document(video_id, kind, content, title=None, summary_method='', summary_language='', model='', catalog_path=CATALOG_PATH):
+    # 同一份文件（影片、種類與摘要參數相同）重新寫入時只更新該筆索引
+    with closing(_connect(catalog_path)) as conn, conn:
+        conn.execute(
+            "INSERT INTO documents "
+            "(video_id, kind, summary_method, summary_language, model, title, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (video_id, kind, summary_method, summary_language, model) DO UPDATE SET "
+            "title = COALESCE(excluded.title, title), updated_at = excluded.updated_at",
+            (video_id, kind, summary_method, summary_language, model, title, time.time())
+        )
+        row = conn.execute(
+            "SELECT id, title FROM documents WHERE video_id = ? AND kind = ? AND summary_method = ? AND summary_language = ? AND model = ?",
+            (video_id, kind, summary_method, summary_language, model)
+        ).fetchone()
+        conn.execute("DELETE FROM documents_fts WHERE rowid = ?", (row['id'],))
+        conn.execute(
+            "INSERT INTO documents_fts (rowid, title, content) VALUES (?, ?, ?)",
+            (row['id'], _space_cjk(row['title']), _space_cjk(content))
+        )
+
+def remove_document(video_id, kind, summary_method='', summary_language='', model='', catalog_path=CATALOG_PATH):
+    with closing(_connect(catalog_path)) as conn, conn:
+        row = conn.execute(
+            "SELECT id FROM documents WHERE video_id = ? AND kind = ? AND summary_method = ? AND summary_language = ? AND model = ?",
+            (video_id, kind, summary_method, summary_language, model)
+        ).fetchone()
+        if row is not None:
+            conn.execute("DELETE FROM documents_fts WHERE rowid = ?", (row['id'],))
+            conn.execute("DELETE FROM documents WHERE id = ?", (row['id'],))
+
+def _parse_query(query):
+    # 每個詞都轉成 FTS5 片語（雙引號包起來），避免使用者輸入被當成查詢語法
+    phrases = []
+    for term in query.split():
+        tokens = _space_cjk(term).replace('"', ' ').split()
+        if tokens:
+            phrases.append('"' + " ".join(tokens) + '"')
+    return " ".join(phrases)
+
+def search(query, limit=20, offset=0, kind=None, highlight=("**", "**"), catalog_path=CATALOG_PATH):
+    match = _parse_query(query)
+    if not match:
+        return []
+
+    sql = (
+        "SELECT d.video_id, d.kind, d.summary_method, d.summary_language, d.model, d.title, "
+        "snippet(documents_fts, 1, ?, ?, '…', 24) AS snippet, rank AS score "
+        "FROM documents_fts JOIN documents d ON d.id = documents_fts.rowid "
+        "WHERE documents_fts MATCH ?"
+    )
+    params = [highlight[0], highlight[1], match]
+    if kind:
+        sql += " AND d.kind = ?"
+        params.append(kind)
+    sql += " ORDER BY rank LIMIT ? OFFSET ?"
+    params += [limit, offset]
+
+    with closing(_connect(catalog_path)) as conn:
+        rows = conn.execute(sql, params).fetchall()
+    results = []
+    for row in rows:
+        result = dict(row)
+        result['snippet'] = _unspace_cjk(result['snippet'], *highlight)
+        results.append(result)
+    return results
+
+def reindex_all(catalog_path=CATALOG_PATH):
+    # 從目錄補建索引（例如升級前已處理的影片）；一般情況由 save_transcript/save_summary 逐筆更新
+    indexed = 0
+    total = count_summaries(catalog_path)
+    seen_transcripts = set()
+    for entry in list_summaries(limit=max(total, 1), catalog_path=catalog_path):
+        video_id = entry['video_id']
+        if video_id not in seen_transcripts:
+            seen_transcripts.add(video_id)
+            transcript = artifacts.load_latest_transcript(video_id)
+            if transcript is not None:
+                index_document(video_id, TRANSCRIPT, transcript, title=entry['title'], catalog_path=catalog_path)
+                indexed += 1
+        summary = artifacts.get_text(artifacts.SUMMARY, video_id, {
+            'method': entry['summary_method'], 'language': entry['summary_language'], 'model': entry['model'],
+        })
+        if summary is not None:
+            index_document(
+                video_id, SUMMARY, summary, title=entry['title'], summary_method=entry['summary_method'],
+                summary_language=entry['summary_language'], model=entry['model'], catalog_path=catalog_path
+            )
+            indexed += 1
+    logger.info(f"Indexed {indexed} documents")
+    return indexed
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["--reindex"]:
+        print(f"Indexed {reindex_all()} documents")
+    elif len(sys.argv) > 1:
+        for result in search(" ".join(sys.argv[1:])):
+            label = result['kind'] if result['kind'] == TRANSCRIPT else f"{result['summary_method']}/{result['summary_language']}/{result['model']}"
+            print(f"{result['video_id']} [{label}] {result['title'] or ''}\n    {result['snippet']}")
+    else:
+        print("Usage: python -m src.search <query> | --reindex")
@@ -0,0 +1,94 @@
+import logging
+import subprocess
+from config.settings import SILENCE_THRESHOLD_DB
+from src.media import ffmpeg_input_args, ffmpeg_binary
+
+logger = logging.getLogger(__name__)
+
+# 能量分析只需要低取樣率的單聲道 PCM
+ANALYSIS_SAMPLE_RATE = 8000
+FRAME_SECONDS = 0.03
+
+def frame_energy_db(audio_path, start, duration, frame_seconds=FRAME_SECONDS):
+    # 只解碼 [start, start + duration] 這一段，並計算每個 frame 的 RMS 音量（dB）
+    import numpy as np
+    command = [
+        ffmpeg_binary(), '-hide_banner', '-loglevel', 'error',
+        '-ss', f"{start:.3f}", '-t', f"{duration:.3f}",
+        *ffmpeg_input_args(audio_path),
+        '-vn', '-ac', '1', '-ar', str(ANALYSIS_SAMPLE_RATE),
+        '-f', 's16le', 'pipe:1',
+    ]
+    result = subprocess.run(command, capture_output=True)
+    if result.returncode != 0:
+        error = result.stderr.decode('utf-8', errors='replace').strip()
+        raise RuntimeError(f"ffmpeg failed to decode audio for silence analysis: {error}")
+
+    samples = np.frombuffer(result.stdout, dtype=np.int16).astype(np.float32) / 32768.0
+    frame_size = int(ANALYSIS_SAMPLE_RATE * frame_seconds)
+    frame_count = len(samples) // frame_size
+    if frame_count == 0:
+        return np.empty(0, dtype=np.float32)
+    frames = samples[:frame_count * frame_size].reshape(frame_count, frame_size)
+    rms = np.sqrt(np.mean(frames ** 2, axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-10))
+
+def find_quiet_point(audio_path, window_start, window_end, min_silence_seconds=0.5, frame_seconds=FRAME_SECONDS):
+    # 在視窗內找出連續 min_silence_seconds 平均音量明顯低於一般音量的停頓，回傳最接近視窗結尾（原本切點）那段停頓的中點（秒）
+    import numpy as np
+    energies = frame_energy_db(audio_path, window_start, window_end - window_start, frame_seconds)
+    width = max(1, int(min_silence_seconds / frame_seconds))
+    if len(energies) < width:
+        return window_end
+    smoothed = np.convolve(energies, np.ones(width) / width, mode='valid')
+    pause_level = np.median(smoothed) - 10
+    if smoothed.min() > pause_level:
+        # 視窗內沒有明顯的停頓，維持原本的切點
+        return window_end
+    # 每段停頓切在正中間；多段停頓時取最接近原本切點的一段，chunk 不會無謂地縮短
+    quiet = np.concatenate(([False], smoothed <= pause_level, [False]))
+    edges = np.flatnonzero(np.diff(quiet.astype(np.int8)))
+    midpoints = [(run_start + run_end) // 2 + width // 2 for run_start, run_end in zip(edges[::2], edges[1::2])]
+    target = (window_end - window_start) / frame_seconds
+    index = min(midpoints, key=lambda midpoint: abs(target - midpoint))
+    return round(float(window_start + index * frame_seconds), 3)
+
+def plan_silence_aware_chunks(audio_path, total_duration, max_duration_seconds, search_seconds):
+    # 每個 chunk 都不超過 max_duration_seconds，邊界落在目標位置前 search_seconds 秒內最接近目標的停頓
+    chunk_ranges = []
+    start = 0
+    while total_duration - start > max_duration_seconds:
+        target = start + max_duration_seconds
+        window_start = max(target - search_seconds, start + max_duration_seconds / 2)
+        cut = find_quiet_point(audio_path, window_start, target)
+        logger.info(f"Chunk boundary moved from {target:.1f}s to pause at {cut:.1f}s")
+        chunk_ranges.append((start, cut))
+        start = cut
+    if total_duration > start:
+        chunk_ranges.append((start, total_duration))
+    return chunk_ranges
+
+def speech_spans(energies, frame_seconds=FRAME_SECONDS, threshold_db=SILENCE_THRESHOLD_DB, min_silence_seconds=2.0, padding_seconds=0.25):
+    # 回傳需要保留的 (start, end) 區段（相對於分析起點的秒數）；
+    # 只有長度超過 min_silence_seconds 的靜音會被移除，前後各保留 padding_seconds
+    import numpy as np
+    if len(energies) == 0:
+        return []
+    level = np.percentile(energies, 95) + threshold_db
+    silent = np.concatenate(([False], energies < level, [False]))
+    edges = np.flatnonzero(np.diff(silent.astype(np.int8)))
+    silence_starts, silence_ends = edges[::2], edges[1::2]
+    min_frames = int(min_silence_seconds / frame_seconds)
+    padding_frames = int(padding_seconds / frame_seconds)
+    long_silences = (silence_ends - silence_starts) >= min_frames
+
+    spans = []
+    cursor = 0
+    for silence_start, silence_end in zip(silence_starts[long_silences], silence_ends[long_silences]):
+        keep_end = silence_start + padding_frames
+        if keep_end > cursor:
+            spans.append((round(float(cursor * frame_seconds), 3), round(float(keep_end * frame_seconds), 3)))
+        cursor = max(cursor, int(silence_end) - padding_frames)
+    if cursor < len(energies):
+        spans.append((round(float(cursor * frame_seconds), 3), round(float(len(energies) * frame_seconds), 3)))
+    return spans
@@ -1,7 +1,10 @@
-import os
+import re
 import logging
-from openai import OpenAI
-import streamlit as st
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from config.settings import SUMMARY_SECTION_MAX_TOKENS, SUMMARY_MAX_WORKERS
+from src.clients import get_client, call_with_retries
+from src import metrics
 
 # 設置日誌記錄
 logger = logging.getLogger(__name__)
@@ -18,32 +21,66 @@ else:
     # 如果已經有處理器，確保日誌級別是正確的
     logger.setLevel(logging.INFO)
 
-# 使用 Streamlit secrets
-# OPENAI_API_KEY = st.secrets["OPENAI_API_KEY"]
-
-OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
-GROQ_API_KEY = os.environ.get("GROQ_API_KEY")
-
-if not OPENAI_API_KEY:
-    logger.error("OPENAI_API_KEY not found in Streamlit secrets.")
-    raise ValueError("OPENAI_API_KEY is not set")
-
-client = OpenAI()
+SECTION_PROMPT_PATH = "src/prompts/section_notes.txt"
+TRANSLATE_PROMPT_PATH = "src/prompts/translate_summary.txt"
+
+CJK_PATTERN = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]')
+SENTENCE_PATTERN = re.compile(r'(?<=[。！？!?；;.])\s*')
+
+@lru_cache(maxsize=None)
+def load_prompt(path):
+    # prompt 檔在執行期間不會變動，只讀取一次
+    with open(path, "r") as file:
+        return file.read()
+
+def estimate_tokens(text):
+    # 粗略估算：中日韓文字約一字一個 token，其他文字約四個字元一個 token
+    cjk_count = len(CJK_PATTERN.findall(text))
+    return cjk_count + (len(text) - cjk_count) // 4 + 1
+
+def _split_long_piece(piece, max_tokens):
+    # 單行過長時，依句號等標點切開；仍過長則直接依字數切
+    sentences = [sentence for sentence in SENTENCE_PATTERN.split(piece) if sentence]
+    parts = []
+    for sentence in sentences:
+        if estimate_tokens(sentence) <= max_tokens:
+            parts.append(sentence)
+            continue
+        step = max(1, len(sentence) * max_tokens // estimate_tokens(sentence))
+        parts.extend(sentence[i:i + step] for i in range(0, len(sentence), step))
+    return parts
+
+def split_transcript(transcript, max_tokens=SUMMARY_SECTION_MAX_TOKENS):
+    sections = []
+    current, current_tokens = [], 0
+    for line in transcript.splitlines():
+        pieces = [line] if estimate_tokens(line) <= max_tokens else _split_long_piece(line, max_tokens)
+        for piece in pieces:
+            piece_tokens = estimate_tokens(piece)
+            if current and current_tokens + piece_tokens > max_tokens:
+                sections.append("\n".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += piece_tokens
+    if current:
+        sections.append("\n".join(current))
+    return sections
 
 class GPT4Summarizer:
-    def __init__(self, summary_method, language='zh', model="gpt-4o-mini"):
+    def __init__(self, summary_method, language='zh', model="gpt-4o-mini", api_key=None):
         logger.info(f"Initializing GPT-4 Summarizer with method: {summary_method}, language: {language}, and model: {model}")
         self.summary_method = summary_method
         self.language = language
         self.model = model
+        # 使用者提供自己的 API key 時，改用該 key 的 client；未提供則使用 OPENAI_API_KEY
+        self.client = get_client('openai', api_key)
         self.user_prompt_path = f"src/prompts/{summary_method}_summary.txt"
         self.load_user_prompt()
 
     def load_user_prompt(self):
         logger.info(f"Loading user prompt from {self.user_prompt_path}")
         try:
-            with open(self.user_prompt_path, "r") as file:
-                self.user_prompt = file.read()
+            self.user_prompt = load_prompt(self.user_prompt_path)
             logger.info("User prompt loaded successfully")
         except FileNotFoundError:
             logger.error(f"User prompt file not found: {self.user_prompt_path}")
@@ -52,24 +89,72 @@ class GPT4Summarizer:
             logger.error(f"Error reading user prompt file: {str(e)}")
             raise
 
-    def summarize_with_gpt4(self, transcript):
+    def _messages(self, instructions, content):
+        # 文字稿（或筆記）放在前面、指示放在最後：同一部影片的不同摘要方式與語言共用相同前綴，
+        # 可命中供應商端的 prompt cache
+        return [
+            {"role": "system", "content": "You are a helpful assistant."},
+            {"role": "user", "content": content},
+            {"role": "user", "content": instructions},
+        ]
+
+    def _complete(self, instructions, content):
+        response = call_with_retries(
+            'openai', self.client.chat.completions.create,
+            model=self.model,
+            messages=self._messages(instructions, content),
+            temperature=0.2
+        )
+        metrics.record_usage(self.model, getattr(response, 'usage', None))
+        return response.choices[0].message.content
+
+    def _stream(self, instructions, content):
+        # 只重試建立串流的請求；開始輸出後發生錯誤則直接拋出
+        stream = call_with_retries(
+            'openai', self.client.chat.completions.create,
+            model=self.model,
+            messages=self._messages(instructions, content),
+            temperature=0.2,
+            stream=True,
+            # 最後一個 chunk 附帶整個請求的 token 用量
+            stream_options={"include_usage": True}
+        )
+        length = 0
+        for chunk in stream:
+            if getattr(chunk, 'usage', None):
+                metrics.record_usage(self.model, chunk.usage)
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                length += len(delta)
+                yield delta
+        logger.info(f"Streaming response completed. Length: {length} characters")
+
+    def _language_prompt(self):
+        return f"請你將你的總結，以 {self.language} 語言輸出"
+
+    def _prepare_content(self, transcript, hierarchical, section_max_tokens, max_workers, notes=None):
+        if notes is not None:
+            return "transcript (condensed section notes, in order):" + notes
+        # hierarchical=None 時依文字稿長度自動決定是否分段
+        if hierarchical is None:
+            hierarchical = estimate_tokens(transcript) > section_max_tokens
+        if hierarchical:
+            notes = self.build_notes(transcript, section_max_tokens, max_workers)
+            return "transcript (condensed section notes, in order):" + notes
+        return "transcript:" + transcript
+
+    def summarize_with_gpt4(self, transcript, hierarchical=None, section_max_tokens=SUMMARY_SECTION_MAX_TOKENS, max_workers=SUMMARY_MAX_WORKERS, notes=None):
         logger.info(f"Starting summarization process with {self.model}")
         logger.info(f"Transcript length: {len(transcript)} characters")
-        language_prompt = f"請你將你的總結，以 {self.language} 語言輸出"
 
         try:
+            content = self._prepare_content(transcript, hierarchical, section_max_tokens, max_workers, notes)
+
             logger.info("Sending request to OpenAI API")
-            response = client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant."},
-                    {"role": "user", "content": self.user_prompt + language_prompt + "transcript:" + transcript},    
-                ],
-                temperature=0.2
-            )
+            summary = self._complete(self.user_prompt + self._language_prompt(), content)
             logger.info("Received response from OpenAI API")
-
-            summary = response.choices[0].message.content
             logger.info(f"Summary generated. Length: {len(summary)} characters")
             return summary
 
@@ -77,6 +162,67 @@ class GPT4Summarizer:
             logger.error(f"Error during summarization: {str(e)}")
             raise
 
+    def stream_summary(self, transcript, hierarchical=None, section_max_tokens=SUMMARY_SECTION_MAX_TOKENS, max_workers=SUMMARY_MAX_WORKERS, notes=None):
+        logger.info(f"Starting streaming summarization with {self.model}")
+        logger.info(f"Transcript length: {len(transcript)} characters")
+
+        try:
+            # 分段摘要（map）仍需先完成，只有最後的合併摘要會逐字輸出
+            content = self._prepare_content(transcript, hierarchical, section_max_tokens, max_workers, notes)
+
+            logger.info("Sending streaming request to OpenAI API")
+            yield from self._stream(self.user_prompt + self._language_prompt(), content)
+
+        except Exception as e:
+            logger.error(f"Error during streaming summarization: {str(e)}")
+            raise
+
+    def _translation_request(self, summary, source_language):
+        instructions = load_prompt(TRANSLATE_PROMPT_PATH) + f"\n\nTranslate the summary above from {source_language} to {self.language}."
+        return instructions, f"summary ({source_language}):" + summary
+
+    def translate_summary(self, summary, source_language):
+        # 由其他語言的既有摘要翻譯，輸入只有摘要本身，遠小於整份文字稿
+        logger.info(f"Translating {self.summary_method} summary from {source_language} to {self.language} with {self.model}")
+        try:
+            translated = self._complete(*self._translation_request(summary, source_language))
+            logger.info(f"Translation completed. Length: {len(translated)} characters")
+            return translated
+        except Exception as e:
+            logger.error(f"Error during summary translation: {str(e)}")
+            raise
+
+    def stream_translation(self, summary, source_language):
+        logger.info(f"Streaming translation of {self.summary_method} summary from {source_language} to {self.language} with {self.model}")
+        try:
+            yield from self._stream(*self._translation_request(summary, source_language))
+        except Exception as e:
+            logger.error(f"Error during streaming translation: {str(e)}")
+            raise
+
+    def build_notes(self, transcript, section_max_tokens=SUMMARY_SECTION_MAX_TOKENS, max_workers=SUMMARY_MAX_WORKERS):
+        # 中間筆記保留文字稿原本的語言，與摘要方式、輸出語言無關，可重複用於同一部影片的所有摘要
+        section_prompt = load_prompt(SECTION_PROMPT_PATH)
+
+        notes = transcript
+        previous_count = None
+        # 各段筆記合併後若仍超過上限，就再做一輪分段整理
+        while True:
+            sections = split_transcript(notes, section_max_tokens)
+            logger.info(f"Summarizing {len(sections)} sections with up to {max_workers} workers")
+            with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(sections)))) as executor:
+                section_notes = list(executor.map(
+                    metrics.bind(lambda item: self._complete(section_prompt, f"section {item[0]}/{len(sections)}:" + item[1])),
+                    enumerate(sections, 1)
+                ))
+            notes = "\n\n".join(
+                f"## Section {i}/{len(sections)}\n{text}" for i, text in enumerate(section_notes, 1)
+            )
+            # 段數不再減少時停止，避免模型輸出過長導致無限循環
+            if len(sections) == 1 or estimate_tokens(notes) <= section_max_tokens or len(sections) == previous_count:
+                return notes
+            previous_count = len(sections)
+
 def summarize_text(text, method="executive"):
     logger.info(f"Starting summarization using method: {method}")
 
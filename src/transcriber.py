@@ -1,78 +1,173 @@
 import os
 import logging
-from groq import Groq
-from config.settings import AUDIO_PATH
-from src.audio_splitter import split_audio
-import streamlit as st
-from openai import OpenAI
-from openai.types.audio import Transcription
+import threading
+from config.settings import (
+    AUDIO_PATH, TRANSCRIBE_MAX_WORKERS, PIPELINE_QUEUE_SIZE,
+    TRANSCRIBE_MAX_RETRIES, TRANSCRIBE_RETRY_DELAY_SECONDS, SPLIT_ON_SILENCE, STRIP_SILENCE,
+    TRANSCRIBE_ENCODING, TRANSCRIBE_MAX_UPLOAD_BYTES, TRANSCRIBE_MAX_CHUNK_SECONDS,
+    LOCAL_WHISPER_MODEL, LOCAL_WHISPER_WORKERS, LOCAL_WHISPER_CHUNK_SECONDS
+)
+from src.audio_splitter import iter_audio_chunks, plan_chunks, chunk_seconds_for_budget
+from src.pipeline import run_pipeline
+from src.media import source_extension
+from src.checkpoints import ChunkCheckpoints
+from src.clients import get_client, call_with_retries
+from src import asr_router
+from src import metrics
 
 # 設置日誌記錄
 logger = logging.getLogger(__name__)
 
-# 使用 Streamlit secrets
-# GROQ_API_KEY = st.secrets["GROQ_API_KEY"]
-# OPENAI_API_KEY = st.secrets["OPENAI_API_KEY"]
+TRANSCRIPTION_MODELS = {
+    'groq': "whisper-large-v3",
+    'openai': "whisper-1",
+    'local': LOCAL_WHISPER_MODEL,
+    # 由 asr_router 分配到各服務，同一 chunk 的結果可能來自任一服務
+    'auto': "auto",
+}
 
-OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
-GROQ_API_KEY = os.environ.get("GROQ_API_KEY")
+def transcribe_chunk(client, service, chunk_path, language, index=None, total=None):
+    label = f"{index}/{total}" if index is not None else chunk_path
+    logger.info(f"Processing chunk {label}: {chunk_path}")
+    with open(chunk_path, "rb") as file:
+        if service == 'groq':
+            logger.info(f"Sending chunk {label} to Groq API for transcription...")
+            transcription = client.audio.transcriptions.create(
+                file=(chunk_path, file.read()),
+                model=TRANSCRIPTION_MODELS['groq'],
+                prompt="",
+                language=language,
+                temperature=0.0
+            )
+            text = transcription.text
+        elif service == 'openai':
+            logger.info(f"Sending chunk {label} to OpenAI API for transcription...")
+            params = {
+                'file': file,
+                'model': TRANSCRIPTION_MODELS['openai'],
+                'response_format': 'text',
+                'language': language,
+                'temperature': 0.0
+            }
+            transcription = client.audio.transcriptions.create(**params)
+            # response_format='text' 時回傳的是字串
+            text = transcription if isinstance(transcription, str) else transcription.text
+        elif service == 'local':
+            logger.info(f"Transcribing chunk {label} with local Whisper model...")
+            from src import local_asr
+            text = local_asr.transcribe(chunk_path, language)
+        else:
+            raise ValueError("Unsupported service specified.")
+    logger.info(f"Chunk {label} transcription completed.")
+    return text
 
-def audio_to_text(audio_path, chunk_duration_seconds=600, service='groq', language='zh'):
-    logger.info(f"Starting transcription process for audio: {audio_path}")
+def _transcribe_with_retries(client, service, chunk_path, language, index, total, max_retries, audio_seconds):
+    if service == 'auto':
+        # 失敗時改送其他服務，過慢時另送一份備援請求；費用依實際回應的服務計算
+        return asr_router.transcribe(
+            lambda provider_client, provider: transcribe_chunk(provider_client, provider, chunk_path, language, index, total),
+            audio_seconds, f"{index}/{total}", max_retries=max_retries
+        )
+    # 只重試逾時、連線錯誤與 429/5xx，並遵守伺服器回傳的 Retry-After
+    return call_with_retries(
+        service, transcribe_chunk, client, service, chunk_path, language, index, total,
+        max_retries=max_retries, base_delay=TRANSCRIBE_RETRY_DELAY_SECONDS
+    )
 
-    if service == 'groq':
-        if not GROQ_API_KEY:
-            logger.error("GROQ_API_KEY not found in Streamlit secrets.")
-            raise ValueError("GROQ_API_KEY is not set")
-        client = Groq(api_key=GROQ_API_KEY)
-    elif service == 'openai':
-        if not OPENAI_API_KEY:
-            logger.error("OPENAI_API_KEY not found in Streamlit secrets.")
-            raise ValueError("OPENAI_API_KEY is not set")
-        client = OpenAI(api_key=OPENAI_API_KEY)
-    else:
-        logger.error("Unsupported service specified.")
-        raise ValueError("Unsupported service specified.")
-
-    transcripts = []
-
-    logger.info("Splitting audio into chunks...")
-    audio_chunks = split_audio(audio_path, max_duration_seconds=chunk_duration_seconds)
-    logger.info(f"Audio split into {len(audio_chunks)} chunks.")
-
-    for i, chunk_path in enumerate(audio_chunks, 1):
-        logger.info(f"Processing chunk {i}/{len(audio_chunks)}: {chunk_path}")
-        try:
-            with open(chunk_path, "rb") as file:
-                if service == 'groq':
-                    logger.info(f"Sending chunk {i} to Groq API for transcription...")
-                    transcription = client.audio.transcriptions.create(
-                        file=(chunk_path, file.read()),
-                        model="whisper-large-v3",
-                        prompt="",
-                        language=language,
-                        temperature=0.0
-                    )
-                    transcripts.append(transcription.text)
-                elif service == 'openai':
-                    logger.info(f"Sending chunk {i} to OpenAI API for transcription...")
-                    params = {
-                        'file': file,
-                        'model': 'whisper-1',
-                        'response_format': 'text',
-                        'language': language,
-                        'temperature': 0.0
-                    }
-                    transcription: Transcription = client.Audio.transcriptions.create(**params)
-                    transcripts.append(transcription['text'])
-
-                logger.info(f"Chunk {i} transcription completed.")
-            
+def _transcribe_and_cleanup(client, service, chunk_path, language, index, total, checkpoints, chunk_range, max_retries):
+    try:
+        upload_bytes = os.path.getsize(chunk_path)
+        audio_seconds = chunk_range[1] - chunk_range[0]
+        text = _transcribe_with_retries(client, service, chunk_path, language, index, total, max_retries, audio_seconds)
+        checkpoints.save(*chunk_range, text)
+        metrics.record(
+            # 本機轉錄沒有上傳
+            bytes_uploaded=0 if service == 'local' else upload_bytes, audio_seconds=audio_seconds,
+            cost_usd=metrics.transcription_cost(service, audio_seconds)
+        )
+        return text
+    except Exception as e:
+        logger.error(f"Error processing chunk {index}: {str(e)}")
+        return None
+    finally:
+        if os.path.exists(chunk_path):
             logger.info(f"Removing temporary file: {chunk_path}")
             os.remove(chunk_path)
-        except Exception as e:
-            logger.error(f"Error processing chunk {i}: {str(e)}")
-            # 可以選擇在這裡添加重試邏輯
+
+def audio_to_text(audio_path, chunk_duration_seconds=None, service='groq', language='zh', max_workers=TRANSCRIBE_MAX_WORKERS, queue_size=PIPELINE_QUEUE_SIZE, max_retries=TRANSCRIBE_MAX_RETRIES, split_on_silence=SPLIT_ON_SILENCE, strip_silence=STRIP_SILENCE, encoding=TRANSCRIBE_ENCODING, max_upload_bytes=TRANSCRIBE_MAX_UPLOAD_BYTES, source_id=None):
+    logger.info(f"Starting transcription process for audio: {audio_path}")
+
+    # client 由 src.clients 共用，連線可跨請求重複使用；本機轉錄不需要 client，模型常駐於 src.local_asr；
+    # auto 由 asr_router 為每個 chunk 挑選服務，這裡先確認至少設定了一個 API key
+    if service == 'auto':
+        asr_router.endpoints()
+    client = None if service in ('local', 'auto') else get_client(service)
+    output_format = "mp3"
+    if service == 'local':
+        # 同時轉錄的 chunk 數不超過模型的 worker 數，多出來的執行緒只會排隊等待
+        max_workers = min(max_workers or 1, LOCAL_WHISPER_WORKERS)
+        # 不需要符合上傳大小限制：以原始格式直接複製音訊幀切出 chunk，由 faster-whisper 解碼，省下一次編碼
+        encoding = None
+        output_format = source_extension(audio_path) or output_format
+        chunk_duration_seconds = chunk_duration_seconds or LOCAL_WHISPER_CHUNK_SECONDS
+
+    if not chunk_duration_seconds:
+        # 未指定 chunk 長度時，依上傳大小限制與編碼位元率推算
+        chunk_duration_seconds = chunk_seconds_for_budget(audio_path, encoding, max_upload_bytes, TRANSCRIBE_MAX_CHUNK_SECONDS)
+
+    chunk_ranges = plan_chunks(audio_path, max_duration_seconds=chunk_duration_seconds, split_on_silence=split_on_silence)
+    total = len(chunk_ranges)
+    logger.info(f"Audio will be split into {total} chunks.")
+
+    # 已有 checkpoint 的 chunk 直接沿用，只切割並轉錄缺少的部分
+    checkpoints = ChunkCheckpoints(
+        audio_path, service, TRANSCRIPTION_MODELS[service], language,
+        variant="_".join(filter(None, [encoding, "speech" if strip_silence else None])) or None,
+        source_id=source_id
+    )
+    transcripts = [checkpoints.load(start, end) for start, end in chunk_ranges]
+    missing = [i for i, text in enumerate(transcripts) if text is None]
+    logger.info(f"{total - len(missing)} chunks restored from checkpoints, {len(missing)} to transcribe.")
+    metrics.record(cache_hits=total - len(missing), cache_misses=len(missing))
+    completed = [total - len(missing)]
+    completed_lock = threading.Lock()
+    metrics.set_progress(completed[0], total)
+
+    def transcribe_and_report(n, chunk_path):
+        text = _transcribe_and_cleanup(
+            client, service, chunk_path, language, missing[n] + 1, total,
+            checkpoints, chunk_ranges[missing[n]], max_retries
+        )
+        with completed_lock:
+            completed[0] += 1
+            metrics.set_progress(completed[0], total)
+        return text
+
+    if missing:
+        # chunk 由獨立執行緒逐一切出並放入有界佇列，切好一段就立刻送出轉錄，
+        # 同時繼續切下一段；結果最後依 chunk 順序組合
+        audio_chunks = iter_audio_chunks(
+            audio_path, max_duration_seconds=chunk_duration_seconds,
+            chunk_ranges=[chunk_ranges[i] for i in missing],
+            strip_silence=strip_silence,
+            encoding=encoding,
+            output_format=output_format
+        )
+        workers = max(1, min(max_workers or 1, len(missing)))
+        logger.info(f"Transcribing {len(missing)} chunks with {workers} workers (queue size {queue_size})...")
+        results = run_pipeline(
+            audio_chunks,
+            transcribe_and_report,
+            workers=workers,
+            queue_size=queue_size
+        )
+        for n, text in enumerate(results):
+            transcripts[missing[n]] = text
+
+    failed = [i + 1 for i, text in enumerate(transcripts) if text is None]
+    if failed:
+        # 不回傳缺段的文字稿；已完成的 chunk 都有 checkpoint，重新執行時只會處理失敗的部分
+        raise RuntimeError(f"Transcription failed for chunks {failed} of {total}; rerun to resume from checkpoints.")
 
     logger.info("All chunks processed. Combining transcripts...")
     full_transcript = "\n".join(transcripts)
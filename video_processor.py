@@ -1,113 +1,321 @@
 import os
-import re
-from src.downloader import download_audio
+import uuid
+import hashlib
+from src.downloader import download_audio, find_downloaded_audio, open_audio_stream
+from src.media import is_remote
 from src.transcriber import audio_to_text
-from src.summarizer import GPT4Summarizer
-from config.settings import AUDIO_PATH, SUMMARY_PATH, TRANSCRIPT_PATH
-from urllib.parse import urlparse, parse_qs
-import requests
-import yt_dlp
+from src.summarizer import GPT4Summarizer, estimate_tokens
+from src.catalog import record_summary
+from src.search import index_document, TRANSCRIPT, SUMMARY
+from src.captions import fetch_captions
+from src.compaction import compact_transcript
+from src import metrics, artifacts
+from src.jobs import single_flight
+from src.metadata import extract_video_id, get_video_metadata, get_cached_info
+from config.settings import (
+    AUDIO_PATH, TRANSCRIBE_MAX_WORKERS, PIPELINE_QUEUE_SIZE,
+    INGEST_MODE, CACHE_AUDIO, USE_CAPTIONS, SUMMARY_FAN_OUT, SUMMARY_SECTION_MAX_TOKENS,
+    COMPACT_TRANSCRIPT, TRANSCRIBE_SERVICE
+)
 
 class VideoProcessor:
     def __init__(self, url):
         self.url = url
         self.audio_path = None
         self.transcript = None
+        # 產生目前文字稿的參數（語言、來源、服務），作為文字稿在 artifact store 中的鍵值
+        self.transcript_params = None
         self.summary = None
-        self.video_name = self.extract_video_name(url)
+        # 檔名一律使用影片 ID，避免標題相同或無法解析時互相覆蓋
+        self.video_id = extract_video_id(url)
+        self.video_name = self.video_id
+        self._metadata = None
+        self._compacted = None
 
-    def extract_video_name(self, url):
-        try:
-            # 使用requests獲取頁面內容
-            response = requests.get(url)
-            response.raise_for_status()
-            
-            # 使用正則表達式從頁面內容中提取視頻標題
-            title_match = re.search(r'<title>(.*?)</title>', response.text)
-            if title_match:
-                video_title = title_match.group(1)
-                # 移除" - YouTube"後綴（如果存在）
-                video_title = video_title.replace(" - YouTube", "").strip()
-                # 將標題轉為有效的文件名
-                video_name = re.sub(r'[^\w\-_\. ]', '_', video_title)
-                # 去除末尾的底線
-                video_name = video_name.rstrip('_')
-                return video_name
-            else:
-                return "unknown_video"
-        except Exception as e:
-            print(f"無法提取視頻名稱: {e}")
-            return "unknown_video"
+    @property
+    def metadata(self):
+        # 每支影片只探測一次，結果在各階段共用
+        if self._metadata is None:
+            self._metadata = get_video_metadata(self.url)
+        return self._metadata
+
+    @property
+    def video_title(self):
+        return self.metadata.get('title') or self.video_id
 
     def get_video_duration(self):
-        ydl_opts = {'quiet': True}
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(self.url, download=False)
-            duration = info.get('duration', 0)
-            return duration
+        return self.metadata.get('duration', 0)
+
+    def _stored_audio(self, audio_params):
+        audio_path = artifacts.get_path(artifacts.AUDIO, self.video_id, audio_params)
+        if audio_path is None:
+            # 舊版直接存放在 AUDIO_PATH 的音訊，移入 store 後沿用
+            if INGEST_MODE == "mp3":
+                legacy_path = os.path.join(AUDIO_PATH, f"{self.video_name}.mp3")
+            else:
+                legacy_path = find_downloaded_audio(AUDIO_PATH, self.video_name)
+            if legacy_path and os.path.exists(legacy_path):
+                audio_path = artifacts.put_file(artifacts.AUDIO, self.video_id, audio_params, legacy_path)
+        return audio_path
 
     def download_and_convert(self, force=False):
         os.makedirs(AUDIO_PATH, exist_ok=True)
-        expected_audio_path = os.path.join(AUDIO_PATH, f"{self.video_name}.mp3")
-        
-        if not force and os.path.exists(expected_audio_path):
-            self.audio_path = expected_audio_path
+        audio_params = {'ingest': INGEST_MODE}
+        stored_audio_path = None if force else self._stored_audio(audio_params)
+
+        if stored_audio_path:
+            self.audio_path = stored_audio_path
+            metrics.record(cache_hits=1)
             print(f"Audio file already exists: {self.audio_path}")
+        elif INGEST_MODE != "mp3" and not CACHE_AUDIO:
+            # 不快取音訊時不下載完整檔案，切割階段直接讀取串流
+            self.audio_path = open_audio_stream(
+                self.url, self.video_name,
+                format_id=self.metadata.get('format_id'),
+                info=get_cached_info(self.video_id)
+            )
+            print(f"Streaming audio for {self.video_name} without a local copy")
         else:
-            self.audio_path = download_audio(self.url, AUDIO_PATH, self.video_name)
+            # 下載到唯一的暫存檔名，同一部影片同時有多個工作下載時不會互相覆蓋
+            downloaded_path = download_audio(
+                self.url, AUDIO_PATH, f"{self.video_name}-{uuid.uuid4().hex[:8]}",
+                format_id=self.metadata.get('format_id'),
+                info=get_cached_info(self.video_id),
+                transcode=INGEST_MODE == "mp3"
+            )
+            metrics.record(cache_misses=1, bytes_downloaded=os.path.getsize(downloaded_path))
+            self.audio_path = artifacts.put_file(artifacts.AUDIO, self.video_id, audio_params, downloaded_path)
             print(f"Audio downloaded and saved to: {self.audio_path}")
 
-    def transcribe(self, service, language='zh', force=False):
-        if not self.audio_path:
-            raise ValueError("Audio hasn't been downloaded yet. Call download_and_convert() first.")
-        
-        expected_transcript_path = os.path.join(TRANSCRIPT_PATH, f"{self.video_name}.txt")
-        
-        if not force and os.path.exists(expected_transcript_path):
-            with open(expected_transcript_path, 'r', encoding='utf-8') as f:
-                self.transcript = f.read()
+    def load_captions(self, language):
+        # 有對應語言且品質足夠的字幕時直接作為文字稿，不需要下載音訊與語音轉錄
+        # 探測或下載字幕失敗都改用語音轉錄，不讓整個工作失敗
+        try:
+            info = get_cached_info(self.video_id)
+            if info is None:
+                self._metadata = get_video_metadata(self.url, force=True)
+                info = get_cached_info(self.video_id)
+            transcript = fetch_captions(info, language)
+        except Exception as e:
+            print(f"Failed to fetch captions, falling back to transcription: {str(e)}")
+            return False
+        if not transcript:
+            return False
+        self.transcript = transcript
+        self.transcript_params = {'language': language, 'source': "captions"}
+        return True
+
+    def transcribe(self, service, language='zh', force=False, max_workers=TRANSCRIBE_MAX_WORKERS, queue_size=PIPELINE_QUEUE_SIZE, use_captions=USE_CAPTIONS):
+        if not force and self.load_transcript(language):
             print("Existing transcript loaded.")
+        elif use_captions and self.load_captions(language):
+            print(f"Transcript loaded from {language} captions.")
+        elif not self.audio_path:
+            raise ValueError("Audio hasn't been downloaded yet. Call download_and_convert() first.")
         else:
-            self.transcript = audio_to_text(self.audio_path, service=service, language=language)
+            # 串流網址每次都不同，checkpoint 改以影片 ID 與音訊格式識別
+            source_id = f"{self.video_id}-{self.metadata.get('format_id')}" if is_remote(self.audio_path) else None
+            self.transcript = audio_to_text(
+                self.audio_path, service=service, language=language,
+                max_workers=max_workers, queue_size=queue_size, source_id=source_id
+            )
+            self.transcript_params = {'language': language, 'source': "asr", 'service': service}
             print("Audio transcription completed.")
 
-    def summarize(self, summary_method="executive", force=False, language='zh', model="gpt-4"):
+    def load_transcript(self, language=None):
+        # 已有文字稿時直接讀取，不需要先下載音訊；優先使用相同語言的文字稿，舊版文字稿沒有語言紀錄，視為符合
+        for entry in artifacts.find(artifacts.TRANSCRIPT, self.video_id):
+            if language is None or entry['params'].get('language') in (language, None):
+                transcript = artifacts.get_text(artifacts.TRANSCRIPT, self.video_id, entry['params'])
+                if transcript is not None:
+                    self.transcript = transcript
+                    self.transcript_params = entry['params']
+                    return True
+        return False
+
+    def _summary_params(self, summary_method, language, model):
+        return {'method': summary_method, 'language': language, 'model': model}
+
+    def summary_path(self, summary_method, language, model):
+        return artifacts.artifact_path(artifacts.SUMMARY, self.video_id, self._summary_params(summary_method, language, model), ".txt")
+
+    def has_summary(self, summary_method, language, model):
+        return artifacts.get_path(artifacts.SUMMARY, self.video_id, self._summary_params(summary_method, language, model)) is not None
+
+    def _load_summary(self, summary_method, language, model):
+        return artifacts.get_text(artifacts.SUMMARY, self.video_id, self._summary_params(summary_method, language, model))
+
+    def _find_translation_source(self, summary_method, language, model):
+        # 同一摘要方式與模型、但不同語言的既有摘要，翻譯即可得到新語言的版本
+        for entry in artifacts.find(artifacts.SUMMARY, self.video_id, method=summary_method, model=model):
+            source_language = entry['params']['language']
+            if source_language != language:
+                summary = artifacts.get_text(artifacts.SUMMARY, self.video_id, entry['params'])
+                if summary is not None:
+                    return source_language, summary
+        return None
+
+    def summary_input(self):
+        # 送去摘要的文字稿；壓縮結果依原始文字稿快取，同一次執行的多個摘要只壓縮一次
+        if not COMPACT_TRANSCRIPT:
+            return self.transcript
+        if self._compacted is None or self._compacted[0] is not self.transcript:
+            compacted, stats = compact_transcript(self.transcript)
+            print(f"Transcript compacted for summarization: {stats['tokens_before']} -> {stats['tokens_after']} tokens ({stats['tokens_saved']} saved)")
+            metrics.record(compaction_tokens_saved=stats['tokens_saved'])
+            self._compacted = (self.transcript, compacted)
+        return self._compacted[1]
+
+    def load_or_build_notes(self, summarizer, force=False):
+        # 每份文字稿只建立一次中間筆記（依送去摘要的文字稿內容與模型區分），供所有摘要方式與語言共用
+        transcript = self.summary_input()
+        notes_params = {
+            'transcript': hashlib.sha256(transcript.encode('utf-8')).hexdigest()[:16],
+            'model': summarizer.model,
+        }
+        notes = None if force else artifacts.get_text(artifacts.NOTES, self.video_id, notes_params)
+        if notes is not None:
+            print(f"Existing section notes loaded for {self.video_name}")
+            metrics.record(cache_hits=1)
+            return notes
+
+        metrics.record(cache_misses=1)
+        notes = summarizer.build_notes(transcript)
+        notes_path = artifacts.put_text(artifacts.NOTES, self.video_id, notes_params, notes, ext=".md")
+        print(f"Section notes saved to: {notes_path}")
+        return notes
+
+    def _derive_summary(self, summarizer, force, stream):
+        if SUMMARY_FAN_OUT and not force:
+            source = self._find_translation_source(summarizer.summary_method, summarizer.language, summarizer.model)
+            if source:
+                source_language, source_summary = source
+                print(f"Translating existing {source_language} summary to {summarizer.language}.")
+                if stream:
+                    return summarizer.stream_translation(source_summary, source_language)
+                return summarizer.translate_summary(source_summary, source_language)
+
+        transcript = self.summary_input()
+        notes = None
+        if SUMMARY_FAN_OUT and estimate_tokens(transcript) > SUMMARY_SECTION_MAX_TOKENS:
+            notes = self.load_or_build_notes(summarizer, force=force)
+        if stream:
+            return summarizer.stream_summary(transcript, notes=notes)
+        return summarizer.summarize_with_gpt4(transcript, notes=notes)
+
+    def summarize(self, summary_method="executive", force=False, language='zh', model="gpt-4", api_key=None):
         if not self.transcript:
             raise ValueError("Transcript hasn't been generated yet. Call transcribe() first.")
         
-        expected_summary_path = os.path.join(SUMMARY_PATH, f"{self.video_name}_{summary_method}_{language}_{model}.txt")
-        
-        if not force and os.path.exists(expected_summary_path):
-            with open(expected_summary_path, 'r', encoding='utf-8') as f:
-                self.summary = f.read()
+        summary = None if force else self._load_summary(summary_method, language, model)
+
+        if summary is not None:
+            self.summary = summary
+            metrics.record(cache_hits=1)
             print(f"Existing {summary_method} summary in {language} using {model} loaded.")
         else:
-            summarizer = GPT4Summarizer(summary_method, language, model)
-            self.summary = summarizer.summarize_with_gpt4(self.transcript)
+            metrics.record(cache_misses=1)
+            summarizer = GPT4Summarizer(summary_method, language, model, api_key=api_key)
+            self.summary = self._derive_summary(summarizer, force, stream=False)
             print(f"{summary_method.capitalize()} summarization in {language} using {model} completed.")
 
+    def summarize_stream(self, summary_method="executive", force=False, language='zh', model="gpt-4", api_key=None):
+        # 逐段產生摘要文字，完成後存入 artifact store；已有摘要時一次回傳
+        if not self.transcript:
+            raise ValueError("Transcript hasn't been generated yet. Call transcribe() first.")
+
+        summary = None if force else self._load_summary(summary_method, language, model)
+
+        if summary is not None:
+            self.summary = summary
+            metrics.record(cache_hits=1)
+            print(f"Existing {summary_method} summary in {language} using {model} loaded.")
+            yield self.summary
+            return
+
+        metrics.record(cache_misses=1)
+        summarizer = GPT4Summarizer(summary_method, language, model, api_key=api_key)
+        parts = []
+        for token in self._derive_summary(summarizer, force, stream=True):
+            parts.append(token)
+            yield token
+        self.summary = "".join(parts)
+        print(f"{summary_method.capitalize()} summarization in {language} using {model} completed.")
+        self.save_summary(summary_method, language, model)
+
     def save_transcript(self):
         if not self.transcript:
             raise ValueError("Transcript hasn't been generated yet. Call transcribe() first.")
-        os.makedirs(TRANSCRIPT_PATH, exist_ok=True)
-        filename = f"{self.video_name}.txt"
-        output_path = os.path.join(TRANSCRIPT_PATH, filename)
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(self.transcript)
+        output_path = artifacts.put_text(artifacts.TRANSCRIPT, self.video_id, self.transcript_params or {}, self.transcript)
         print(f"Transcript saved to: {output_path}")
+        index_document(self.video_id, TRANSCRIPT, self.transcript, title=self.video_title)
 
     def save_summary(self, summary_method, language, model):
         if not self.summary:
             raise ValueError("Summary hasn't been generated yet. Call summarize() first.")
-        os.makedirs(SUMMARY_PATH, exist_ok=True)
-        filename = f"{self.video_name}_{summary_method}_{language}_{model}.txt"
-        output_path = os.path.join(SUMMARY_PATH, filename)
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(self.summary)
+        output_path = artifacts.put_text(
+            artifacts.SUMMARY, self.video_id, self._summary_params(summary_method, language, model), self.summary
+        )
         print(f"Summary saved to: {output_path}")
+        index_document(
+            self.video_id, SUMMARY, self.summary, title=self.video_title,
+            summary_method=summary_method, summary_language=language, model=model
+        )
+
+def run_analysis(url, summary_method, transcribe_language, summary_language, model, api_key=None, force_summarize=False, service=TRANSCRIBE_SERVICE, report=None, job_id=None):
+    # 背景工作使用的完整流程；report 用來回報進度給 JobManager，進度與各階段的計量由 JobMetrics 記錄
+    report = report or (lambda persist=True, **progress: None)
+    processor = VideoProcessor(url)
+    job_metrics = metrics.JobMetrics(
+        job_id, processor.video_id,
+        # 執行中的進度只更新記憶體，階段結束時才寫入工作狀態
+        listener=lambda event: report(
+            persist=event['status'] != "running",
+            progress=event['progress'], stage=event['stage'], stage_status=event['status']
+        )
+    )
+
+    try:
+        # 下載只依影片、轉錄只依影片、語言與服務合併；摘要設定不同的工作不會重複下載與轉錄
+        with single_flight(processor.video_id, metrics.TRANSCRIBE, {'language': transcribe_language, 'service': service}):
+            # 已有文字稿或可用的字幕時，跳過下載與語音轉錄
+            if processor.load_transcript(transcribe_language):
+                job_metrics.skip(metrics.DOWNLOAD)
+                job_metrics.skip(metrics.TRANSCRIBE)
+            else:
+                has_captions = False
+                if USE_CAPTIONS:
+                    with job_metrics.stage(metrics.CAPTIONS):
+                        has_captions = processor.load_captions(transcribe_language)
+                if has_captions:
+                    job_metrics.skip(metrics.DOWNLOAD, status="skipped")
+                    job_metrics.skip(metrics.TRANSCRIBE, status="skipped")
+                else:
+                    with job_metrics.stage(metrics.DOWNLOAD):
+                        with single_flight(processor.video_id, metrics.DOWNLOAD, {'ingest': INGEST_MODE}):
+                            processor.download_and_convert(force=False)
+                    with job_metrics.stage(metrics.TRANSCRIBE):
+                        processor.transcribe(service=service, force=False, language=transcribe_language, use_captions=False)
+            processor.save_transcript()
+
+        with job_metrics.stage(metrics.SUMMARIZE):
+            partial = ""
+            for token in processor.summarize_stream(summary_method=summary_method, force=force_summarize, language=summary_language, model=model, api_key=api_key):
+                partial += token
+                report(persist=False, partial=partial)
+    except Exception:
+        job_metrics.finish("failed")
+        raise
+
+    entry = record_summary(
+        processor.video_id, summary_method, summary_language, model,
+        youtube_url=url, title=processor.video_title
+    )
+    snapshot = job_metrics.finish("succeeded")
+    return {'video_name': processor.video_name, 'entry_id': entry['id'], 'metrics': snapshot['totals']}
 
 # 確保 VideoProcessor 類被導出
-__all__ = ['VideoProcessor']
+__all__ = ['VideoProcessor', 'run_analysis']
 
 # 如果需要，可以保留 main 函數，但將其放在 if __name__ == '__main__': 塊中
 if __name__ == '__main__':